@@ -26,19 +26,6 @@ class ComputedfieldsConfig(AppConfig):
         # normal startup
         BOOT_RESOLVER.initialize()
 
-        # connect signals
-        from computedfields.handlers import (
-            postsave_handler, predelete_handler, postdelete_handler, m2m_handler, get_old_handler)
-        from django.db.models.signals import (
-            post_save, m2m_changed, pre_delete, post_delete, pre_save)
-
-        pre_save.connect(
-            get_old_handler, sender=None, weak=False, dispatch_uid='COMP_FIELD_PRESAVE')
-        post_save.connect(
-            postsave_handler, sender=None, weak=False, dispatch_uid='COMP_FIELD')
-        pre_delete.connect(
-            predelete_handler, sender=None, weak=False, dispatch_uid='COMP_FIELD_PREDELETE')
-        post_delete.connect(
-            postdelete_handler, sender=None, weak=False, dispatch_uid='COMP_FIELD_POSTDELETE')
-        m2m_changed.connect(
-            m2m_handler, sender=None, weak=False, dispatch_uid='COMP_FIELD_M2M')
+        # connect signals per sender
+        from computedfields.handlers import connect_handlers
+        connect_handlers(BOOT_RESOLVER)
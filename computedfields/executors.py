@@ -0,0 +1,263 @@
+"""
+Module containing the executors for dependency updates beyond the local level.
+
+By default the resolver updates dependent computed fields synchronously within
+the ``save`` call or the ``update_dependent`` call. With the setting
+``COMPUTEDFIELDS_CONSISTENCY`` this can be changed per source model:
+
+    - ``'sync'``: update dependent records directly (default)
+    - ``'async'``: hand off the update to the executor set by ``COMPUTEDFIELDS_EXECUTOR``
+      after the current transaction commits
+    - ``'eventual'``: write the update to the database queue table, the queue is processed
+      by the management command ``processupdates``
+
+An update job is a list of ``[model_label, pks, fields]`` entries, where `fields`
+might be ``None`` for all computed fields of the model. The job contains only
+the first level of dependent records, all further levels are resolved by the executor
+when running the job.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, connections
+from django.utils.module_loading import import_string
+
+from .helper import ComputedFieldsException, process_init
+
+logger = logging.getLogger(__name__)
+
+CONSISTENCY_LEVELS = ('sync', 'async', 'eventual')
+
+# context local flag (per thread and asyncio task) to mark running jobs
+WORKER = ContextVar('computedfields_worker', default=False)
+
+
+@contextmanager
+def worker():
+    """
+    Context manager to mark the current thread or task as executing an update job.
+    Dependency updates within the block are always done synchronously.
+    """
+    token = WORKER.set(True)
+    try:
+        yield
+    finally:
+        WORKER.reset(token)
+
+
+def in_worker():
+    """
+    Whether the current thread or task executes an update job.
+    """
+    return WORKER.get()
+
+
+def get_consistency(model):
+    """
+    Returns the consistency level for dependency updates triggered by `model`,
+    as set in ``COMPUTEDFIELDS_CONSISTENCY`` by the model label.
+    """
+    level = getattr(settings, 'COMPUTEDFIELDS_CONSISTENCY', {}).get(model._meta.label, 'sync')
+    if level not in CONSISTENCY_LEVELS:
+        raise ComputedFieldsException(
+            'unknown consistency level "{}" for model "{}"'.format(level, model._meta.label))
+    return level
+
+
+def get_strongest_consistency(models):
+    """
+    Returns the strongest consistency level of `models` for dependency updates
+    triggered by several models at once (``'sync'`` before ``'eventual'`` before ``'async'``).
+    """
+    levels = set(get_consistency(model) for model in models)
+    for level in ('sync', 'eventual', 'async'):
+        if level in levels:
+            return level
+    return 'sync'
+
+
+def create_job(updates):
+    """
+    Create a serializable update job from a pk map ``{model: [pks, fields]}``.
+    """
+    return [
+        [model._meta.label, list(pks), sorted(fields) if fields else None]
+        for model, (pks, fields) in updates.items() if pks
+    ]
+
+
+def run_job(job):
+    """
+    Run the update job `job`. Called by the executors and the queue worker.
+    """
+    from .resolver import active_resolver
+    with worker(), transaction.atomic():
+        for label, pks, fields in job:
+            model = apps.get_model(label)
+            active_resolver.bulk_updater(
+                model.objects.filter(pk__in=pks), set(fields) if fields else None)
+
+
+class SyncExecutor:
+    """
+    Executor running update jobs directly in the calling thread.
+    Mainly useful for testing.
+    """
+    def submit(self, job):
+        run_job(job)
+
+    def wait(self):
+        pass
+
+
+def _thread_job(job):
+    try:
+        run_job(job)
+    finally:
+        # worker threads open their own connections
+        connections.close_all()
+
+
+class ThreadExecutor:
+    """
+    Executor running update jobs in a thread pool (default executor).
+
+    The pool size can be set with ``COMPUTEDFIELDS_EXECUTOR_WORKERS``.
+    """
+    pool_class = ThreadPoolExecutor
+    job_func = staticmethod(_thread_job)
+
+    def __init__(self):
+        self._pool = self.create_pool(getattr(settings, 'COMPUTEDFIELDS_EXECUTOR_WORKERS', None))
+        self._futures = set()
+        self._lock = Lock()
+
+    def create_pool(self, workers):
+        return self.pool_class(max_workers=workers)
+
+    def submit(self, job):
+        future = self._pool.submit(self.job_func, job)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def wait(self):
+        """
+        Wait for all submitted jobs to finish.
+        """
+        with self._lock:
+            futures = set(self._futures)
+        for future in wait(futures).done:
+            future.result()
+
+
+class ProcessExecutor(ThreadExecutor):
+    """
+    Executor running update jobs in a process pool.
+
+    The worker processes inherit the django setup of the parent process,
+    thus the platform should support the `fork` start method.
+    """
+    pool_class = ProcessPoolExecutor
+    job_func = staticmethod(run_job)
+
+    def create_pool(self, workers):
+        return self.pool_class(max_workers=workers, initializer=process_init)
+
+
+EXECUTORS = {
+    'sync': SyncExecutor,
+    'thread': ThreadExecutor,
+    'process': ProcessExecutor
+}
+_INSTANCES = {}
+_INSTANCES_LOCK = Lock()
+
+
+def get_executor():
+    """
+    Returns the executor set by ``COMPUTEDFIELDS_EXECUTOR``.
+
+    The setting can be one of ``'sync'``, ``'thread'`` (default), ``'process'``
+    or a dotted path to a custom executor class. A custom executor must implement
+    ``submit(job)`` and ``wait()``.
+    """
+    name = getattr(settings, 'COMPUTEDFIELDS_EXECUTOR', 'thread')
+    with _INSTANCES_LOCK:
+        if name not in _INSTANCES:
+            cls = EXECUTORS[name] if name in EXECUTORS else import_string(name)
+            _INSTANCES[name] = cls()
+        return _INSTANCES[name]
+
+
+def dispatch(level, updates, using=None):
+    """
+    Hand off the dependency updates in pk map `updates` according to the consistency `level`.
+
+    For ``'async'`` the job is submitted to the executor after the current transaction
+    commits, for ``'eventual'`` it is written to the queue table within the transaction.
+    """
+    job = create_job(updates)
+    if not job:
+        return
+    if level == 'async':
+        transaction.on_commit(lambda: get_executor().submit(job), using=using)
+    elif level == 'eventual':
+        from .models import UpdateJob
+        UpdateJob.objects.using(using).create(data=json.dumps(job, cls=DjangoJSONEncoder))
+    else:
+        run_job(job)
+
+
+def process_queue(limit=None, using=None):
+    """
+    Run queued update jobs in creation order. Returns the number of processed jobs.
+
+    Each job is run and removed in its own transaction. On databases supporting
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` multiple workers can process the queue
+    concurrently.
+
+    A failing job is rolled back, logged and marked with the error. It gets retried
+    by later calls until ``COMPUTEDFIELDS_QUEUE_RETRIES`` (default 3) attempts are reached,
+    after that it stays in the queue table without blocking other jobs.
+    `limit` counts failed jobs as well.
+    """
+    from .models import UpdateJob
+    retries = getattr(settings, 'COMPUTEDFIELDS_QUEUE_RETRIES', 3)
+    done = 0
+    failed = set()
+    while limit is None or done + len(failed) < limit:
+        with transaction.atomic(using=using):
+            queryset = UpdateJob.objects.using(using).filter(
+                attempts__lt=retries).exclude(pk__in=failed).order_by('pk')
+            if connections[queryset.db].features.has_select_for_update_skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            job = queryset.first()
+            if not job:
+                break
+            try:
+                # savepoint, a failing job does not abort the outer transaction
+                with transaction.atomic(using=using):
+                    run_job(json.loads(job.data))
+            except Exception as exc:
+                logger.exception('update job %s failed', job.pk)
+                failed.add(job.pk)
+                job.attempts += 1
+                job.error = '{}: {}'.format(type(exc).__name__, exc)
+                job.save(update_fields=['attempts', 'error'])
+                continue
+            job.delete()
+        done += 1
+    return done
@@ -10,14 +10,10 @@ the signal handlers.
 from collections import OrderedDict
 from django.core.exceptions import FieldDoesNotExist
 from django.db.models import ForeignKey
-from computedfields.helper import pairwise, is_sublist, modelname, parent_to_inherited_path, skip_equal_segments
+from computedfields.helper import (pairwise, modelname, parent_to_inherited_path, skip_equal_segments,
+                                   strongly_connected, ComputedFieldsException)
 
 
-class ComputedFieldsException(Exception):
-    """
-    Base exception raised from computed fields.
-    """
-
 class CycleException(ComputedFieldsException):
     """
     Exception raised during path linearization, if a cycle was found.
@@ -199,20 +195,29 @@ class Graph:
         """
         return [Edge(*pair) for pair in pairwise(path)]
 
-    def _get_edge_paths(self, edge, left_edges, paths, seen=None):
+    def _get_edge_paths(self, edge, left_edges, paths):
         """
-        Walks the graph recursively to get all possible paths.
+        Walks the graph from `edge` to get all possible paths.
         Might raise a ``CycleEdgeException``.
-        """
-        if not seen:
-            seen = []
-        if edge in seen:
-            raise CycleEdgeException(seen[seen.index(edge):])
-        seen.append(edge)
-        if edge.right in left_edges:
-            for new_edge in left_edges[edge.right]:
-                self._get_edge_paths(new_edge, left_edges, paths, seen[:])
-        paths.append(seen)
+
+        The walk is done iteratively on one shared path with an explicit stack
+        of edge iterators, a path gets only copied when appended to `paths`.
+        """
+        path = [edge]
+        on_path = set(path)
+        stack = [iter(left_edges.get(edge.right, []))]
+        while stack:
+            for new_edge in stack[-1]:
+                if new_edge in on_path:
+                    raise CycleEdgeException(path[path.index(new_edge):])
+                path.append(new_edge)
+                on_path.add(new_edge)
+                stack.append(iter(left_edges.get(new_edge.right, [])))
+                break
+            else:
+                stack.pop()
+                paths.append(path[:])
+                on_path.discard(path.pop())
 
     def get_edgepaths(self):
         """
@@ -222,10 +227,8 @@ class Graph:
         Might raise a ``CycleEdgeException``. For in-depth cycle detection
         use ``edge_cycles``, `node_cycles`` or ``get_cycles()``.
         """
-        left_edges = OrderedDict()
+        left_edges = self._get_left_edges()
         paths = []
-        for edge in self.edges:
-            left_edges.setdefault(edge.left, []).append(edge)
         for edge in self.edges:
             self._get_edge_paths(edge, left_edges, paths)
         return paths
@@ -247,35 +250,152 @@ class Graph:
             node_paths.append(self.edgepath_to_nodepath(path))
         return node_paths
 
-    def _get_cycles(self, edge, left_edges, cycles, seen=None):
+    def _get_left_edges(self):
         """
-        Walks the graph to collect all cycles.
+        Returns a mapping of nodes to their outgoing edges.
         """
-        if not seen:
-            seen = []
-        if edge in seen:
-            cycle = frozenset(seen[seen.index(edge):])
-            data = cycles.setdefault(cycle, {'entries': set(), 'path': []})
-            if seen:
-                data['entries'].add(seen[0])
-            data['path'] = seen[seen.index(edge):]
-            return
-        seen.append(edge)
-        if edge.right in left_edges:
-            for new_edge in left_edges[edge.right]:
-                self._get_cycles(new_edge, left_edges, cycles, seen[:])
+        left_edges = OrderedDict()
+        for edge in self.edges:
+            left_edges.setdefault(edge.left, []).append(edge)
+        return left_edges
 
-    def get_cycles(self):
+    def get_topological_order(self):
         """
-        Gets all cycles in graph.
+        Returns all nodes in topological order (Kahn's algorithm, linear runtime).
 
-        This is not optimised by any means, it simply walks the whole graph
-        recursively and aborts as soon a seen edge gets entered again.
-        Therefore use this and all dependent properties
-        (``edge_cycles`` and ``node_cycles``) for in-depth cycle inspection
-        only.
+        Raises a ``CycleEdgeException`` containing one cycle as list of edges,
+        if the graph is not a DAG.
+        """
+        left_edges = self._get_left_edges()
+        indegree = dict.fromkeys(self.nodes, 0)
+        for edge in self.edges:
+            indegree.setdefault(edge.left, 0)
+            indegree[edge.right] = indegree.get(edge.right, 0) + 1
+        ready = [node for node, degree in indegree.items() if not degree]
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for edge in left_edges.get(node, []):
+                indegree[edge.right] -= 1
+                if not indegree[edge.right]:
+                    ready.append(edge.right)
+        if len(order) != len(indegree):
+            raise CycleEdgeException(self._find_cycle(indegree))
+        return order
+
+    def _find_cycle(self, indegree):
+        """
+        Extract one cycle from the nodes left over by the topological sort.
+        Every left over node has a left over parent, thus walking the parents
+        must end in a cycle.
+        """
+        remaining = set(node for node, degree in indegree.items() if degree)
+        parent = {}
+        for edge in self.edges:
+            if edge.left in remaining and edge.right in remaining:
+                parent[edge.right] = edge
+        node = next(iter(remaining))
+        path = []
+        pos = {}
+        while node not in pos:
+            pos[node] = len(path)
+            edge = parent[node]
+            path.append(edge)
+            node = edge.left
+        return path[pos[node]:][::-1]
+
+    def _transitive_reduction(self):
+        """
+        Remove all edges, whose end node can be reached by another path from its start node.
+
+        Walks the nodes in reverse topological order and accumulates the reachable nodes
+        as bitsets. Child nodes are tested closest first in topological order, thus an edge
+        to an already reachable child is redundant. Runtime is O(nodes * edges / wordsize).
+
+        Might raise a ``CycleEdgeException``. Returns the removed edges.
+        """
+        order = self.get_topological_order()
+        index = dict((node, pos) for pos, node in enumerate(order))
+        left_edges = self._get_left_edges()
+        reach = {}
+        removed = set()
+        for node in reversed(order):
+            reachable = 0
+            for edge in sorted(left_edges.get(node, []), key=lambda edge: index[edge.right]):
+                bit = 1 << index[edge.right]
+                if reachable & bit:
+                    removed.add(edge)
+                else:
+                    reachable |= bit | reach[edge.right]
+            reach[node] = reachable
+        for edge in removed:
+            self.remove_edge(edge)
+        return removed
 
-        As a start node any node on the left side of an edge will be tested.
+    def _get_successors(self):
+        successors = dict((node, set()) for node in self.nodes)
+        for edge in self.edges:
+            successors.setdefault(edge.left, set()).add(edge.right)
+            successors.setdefault(edge.right, set())
+        return successors
+
+    def _simple_cycles(self, successors):
+        """
+        Generates all elementary cycles as node lists (Johnson's algorithm).
+        """
+        for node, children in successors.items():
+            if node in children:
+                yield [node]
+        components = [c for c in strongly_connected(successors, set(successors)) if len(c) > 1]
+        while components:
+            component = components.pop()
+            start = component.pop()
+            path = [start]
+            blocked = set([start])
+            closed = set()
+            blocking = {}
+            stack = [(start, [n for n in successors[start] if n in component or n is start])]
+            while stack:
+                node, children = stack[-1]
+                if children:
+                    child = children.pop()
+                    if child is start:
+                        yield path[:]
+                        closed.update(path)
+                    elif child not in blocked:
+                        path.append(child)
+                        stack.append((child, [n for n in successors[child]
+                                              if n in component or n is start]))
+                        closed.discard(child)
+                        blocked.add(child)
+                        continue
+                if not children:
+                    if node in closed:
+                        # unblock node and all nodes blocked by it
+                        unblock = set([node])
+                        while unblock:
+                            current = unblock.pop()
+                            if current in blocked:
+                                blocked.remove(current)
+                                unblock.update(blocking.pop(current, ()))
+                    else:
+                        for child in successors[node]:
+                            if child in component or child is start:
+                                blocking.setdefault(child, set()).add(node)
+                    stack.pop()
+                    path.pop()
+            components.extend(c for c in strongly_connected(successors, component) if len(c) > 1)
+
+    def get_cycles(self):
+        """
+        Gets all elementary cycles in graph.
+
+        The cycles are searched with Johnson's algorithm on the strongly connected
+        components (Tarjan), which is linear in the number of cycles found.
+        Since a graph might contain a huge number of cycles, use this and all
+        dependent properties (``edge_cycles`` and ``node_cycles``) for in-depth cycle
+        inspection only. For a simple cycle check use ``is_cyclefree``.
 
         Returns a mapping of
 
@@ -283,18 +403,36 @@ class Graph:
 
             {frozenset(<cycle edges>): {
                 'entries': set(edges leading to the cycle),
-                'path': list(cycle edges in last seen order)
+                'path': list(cycle edges in walking order)
             }}
 
         An edge in ``entries`` is not necessarily part of the cycle itself,
         but once entered it will lead to the cycle.
         """
-        left_edges = OrderedDict()
-        cycles = {}
-        for edge in self.edges:
-            left_edges.setdefault(edge.left, []).append(edge)
+        successors = self._get_successors()
+        predecessors = dict((node, set()) for node in successors)
         for edge in self.edges:
-            self._get_cycles(edge, left_edges, cycles)
+            predecessors[edge.right].add(edge)
+        cycles = {}
+        reaching = {}   # cycle start node --> edges leading to it
+        for nodes in self._simple_cycles(successors):
+            path = self.nodepath_to_edgepath(nodes + [nodes[0]])
+            # all cycle nodes share the same reverse reachability,
+            # thus cache the entries by any node of the cycle
+            key = next((node for node in nodes if node in reaching), None)
+            if key is None:
+                key = nodes[0]
+                entries = set()
+                seen = set([key])
+                todo = [key]
+                while todo:
+                    for edge in predecessors[todo.pop()]:
+                        entries.add(edge)
+                        if edge.left not in seen:
+                            seen.add(edge.left)
+                            todo.append(edge.left)
+                reaching[key] = entries
+            cycles[frozenset(path)] = {'entries': reaching[key], 'path': path}
         return cycles
 
     @property
@@ -320,56 +458,31 @@ class Graph:
         True if the graph contains no cycles.
 
         For faster calculation this property relies on
-        path linearization instead of the more expensive
+        a topological sort instead of the more expensive
         full cycle detection. For in-depth cycle inspection
         use ``edge_cycles`` or ``node_cycles`` instead.
         """
         try:
-            self.get_edgepaths()
+            self.get_topological_order()
             return True
         except CycleEdgeException:
             return False
 
-    def _can_replace_nodepath(self, needle, haystack):
-        if not set(haystack).issuperset(needle):
-            return False
-        if is_sublist(needle, haystack):
-            return False
-        return True
-
-    def _compare_startend_nodepaths(self, new_paths, base_paths):
-        base_points = set((path[0], path[-1]) for path in base_paths)
-        new_points = set((path[0], path[-1]) for path in new_paths)
-        return base_points == new_points
-
     def remove_redundant(self):
         """
         Find and remove redundant edges. An edge is redundant
         if there there are multiple possibilities to reach an end node
         from a start node. Since the longer path triggers more needed
         database updates the shorter path gets discarded.
+        This is the transitive reduction of the graph.
         Might raise a ``CycleNodeException``.
 
         Returns the removed edges.
         """
-        paths = self.get_nodepaths()
-        possible_replaces = []
-        for p_path in paths:
-            for q_path in paths:
-                if self._can_replace_nodepath(q_path, p_path):
-                    possible_replaces.append((q_path, p_path))
-        removed = set()
-        for candidate, _ in possible_replaces:
-            edges = [Edge(*nodes) for nodes in pairwise(candidate)]
-            for edge in edges:
-                if edge in removed:
-                    continue
-                self.remove_edge(edge)
-                removed.add(edge)
-                # make sure all startpoints will still update all endpoints
-                if not self._compare_startend_nodepaths(self.get_nodepaths(), paths):
-                    self.add_edge(edge)
-                    removed.remove(edge)
+        try:
+            removed = self._transitive_reduction()
+        except CycleEdgeException as exc:
+            raise CycleNodeException(self.edgepath_to_nodepath(exc.args[0]))
         self._removed.update(removed)
         return removed
 
@@ -387,7 +500,7 @@ class ComputedModelsGraph(Graph):
       the underlying graph.
     - The graph does a cycle check and removes redundant edges
       to lower the database penalty.
-    - In ``generate_lookup_map`` the path segments of remaining edges
+    - In ``generate_lookup_map`` the path segments of the edges
       are collected into the final lookup map.
     """
     def __init__(self, computed_models):
@@ -431,14 +544,19 @@ class ComputedModelsGraph(Graph):
         - reverse fk relations are added on related model holding the fk field
         - m2m fields and backrelations are added on the model directly, but
           only used for inter-model resolving, never for field lookups during ``save``
+
+        Along the way the relation paths are collected as query optimizations
+        of the computed fields (see ``generate_related_map``).
         """
         global_deps = OrderedDict()
         local_deps = {}
+        related = {}
         for model, fields in computed_models.items():
             local_deps.setdefault(model, {})    # always add to local to get a result for MRO
             for field, real_field in fields.items():
                 fieldentry = global_deps.setdefault(model, {}).setdefault(field, {})
                 local_deps.setdefault(model, {}).setdefault(field, set())
+                select, prefetch = related.setdefault(model, {}).setdefault(field, ([], []))
 
                 depends = real_field._computed['depends']
 
@@ -481,8 +599,13 @@ class ComputedModelsGraph(Graph):
                         local_deps.setdefault(model, {}).setdefault(field, set()).update(fieldnames)
                         continue
                     path_segments = []
+                    # leading fk/o2o segments can be joined by select_related,
+                    # anything behind a reverse or m2m relation needs prefetch_related
+                    accessors = []
+                    joinable = []
                     cls = model
                     for symbol in path.split('.'):
+                        accessors.append(symbol)
                         try:
                             rel = cls._meta.get_field(symbol)
                             if rel.many_to_many:
@@ -514,13 +637,20 @@ class ComputedModelsGraph(Graph):
                             # add segment to intermodel graph deps
                             fieldentry.setdefault(cls, []).append(
                                 {'path': '__'.join(path_segments), 'depends': symbol})
+                        if len(joinable) == len(accessors) - 1 and rel.concrete \
+                                and (rel.many_to_one or rel.one_to_one):
+                            joinable.append(accessors[-1])
                         path_segments.append(symbol)
                         cls = rel.related_model
+                    if joinable and '__'.join(joinable) not in select:
+                        select.append('__'.join(joinable))
+                    if len(joinable) < len(accessors) and '__'.join(accessors) not in prefetch:
+                        prefetch.append('__'.join(accessors))
                     for target_field in fieldnames:
                         self._right_constrain(cls, target_field)
                         fieldentry.setdefault(cls, []).append(
                             {'path': '__'.join(path_segments), 'depends': target_field})
-        return {'global': global_deps, 'local': local_deps}
+        return {'global': global_deps, 'local': local_deps, 'related': related}
 
     def _clean_data(self, data):
         """
@@ -678,12 +808,18 @@ class ComputedModelsGraph(Graph):
             dependencies should always be used to get properly updated.
 
         .. NOTE::
-            The created map is also used for the pickle file to circumvent
+            The created map is also used for the compiled map file to circumvent
             the computationally expensive graph and map creation in production mode.
+
+        .. NOTE::
+            Edges removed as redundant are still added to the map. The resolver only
+            descends from records with changed computed values, thus the longer path
+            cannot stand in for them. Since the cascade merges pending records by
+            topological order, they cost a pk query, but no additional update pass.
         """
         # apply full node information to graph edges
         table = {}
-        for edge in self.edges:
+        for edge in self.edges | self._removed:
             lmodel, lfield = edge.left.data
             lmodel = self.models[lmodel]
             rmodel, rfield = edge.right.data
@@ -745,9 +881,32 @@ class ComputedModelsGraph(Graph):
             which allows quick field update merges at runtime by doing binary OR on the bitarrays.
         """
         self.prepare_modelgraphs()
-        return dict((model, g.generate_local_mapping(
-            g.generate_field_paths(g.get_topological_paths())))
-                    for model, g in self.modelgraphs.items())
+        return dict((model, g.generate_local_masks()) for model, g in self.modelgraphs.items())
+
+    def generate_related_map(self):
+        """
+        Generate the query optimizations derived from the `depends` rules.
+        Returns a mapping of models with their computed fields and
+        ``[select_related, prefetch_related]`` lookups, example:
+
+        .. code:: python
+
+            {
+                modelX: {
+                    'c1': [['fk', 'fk__other'], ['children', 'fk__m2m']]
+                }
+            }
+
+        Leading fk and o2o segments of a relation path are joined with ``select_related``,
+        paths containing a reverse or m2m relation get fetched with ``prefetch_related``.
+        Fields without any relation in `depends` are omitted.
+        """
+        final = {}
+        for model, fields in self.resolved['related'].items():
+            for field, (select, prefetch) in fields.items():
+                if select or prefetch:
+                    final.setdefault(model, {})[field] = [select, prefetch]
+        return final
 
     def get_uniongraph(self):
         """
@@ -805,66 +964,86 @@ class ModelGraph(Graph):
         Remove redundant single edges. Also checks for cycles.
         *Note:* Other than intermodel dependencies local dependencies must always be cyclefree.
         """
-        paths = self.get_edgepaths()
-        remove = set()
-        for path1 in paths:
-            # we only cut single edge paths
-            if len(path1) > 1:
-                continue
-            left = path1[0].left
-            right = path1[-1].right
-            for path2 in paths:
-                if path2 == path1:
-                    continue
-                if right == path2[-1].right and left == path2[0].left:
-                    remove.add(path1[0])
-        for edge in remove:
-            self.remove_edge(edge)
+        self._transitive_reduction()
 
-    def _tsort(self, graph, start, paths, path):
+    def _tsort(self, graph):
         """
-        Recursive deep first search variant of topsort.
-        Also accumulates any revealed subpaths.
+        Deep first search variant of topsort with one shared stack of child iterators,
+        starting with the ``'##'`` node. Might raise a ``CycleNodeException``.
+
+        Returns the computed fields in topological order and a mapping of all nodes
+        to a bitarray of their dependent computed fields by position in that order
+        (a computed field contains itself). Other than lists of subpaths per node
+        the bitarrays are merged by binary OR.
         """
-        for node in graph.get(start, []):
-            if not node in paths:
-                # accumulate revealed topological subpaths
-                paths[node] = self._tsort(graph, node, paths, [])
-            for snode in paths[node]:
-                # append node if its not yet part of the path
-                if not snode in path:
-                    path += [snode]
-        path += [start]
-        return path
+        start = Node('##')
+        on_stack = set()
+        done = set()
+        order = []      # postorder, dependents go first
+        computed = None
+        for root in [start] + [node for node in graph if node != start]:
+            if root in done:
+                continue
+            on_stack.add(root)
+            stack = [(root, iter(graph.get(root, [])))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if child in on_stack:
+                        nodes = [entry for entry, _ in stack]
+                        raise CycleNodeException(nodes[nodes.index(child):] + [child])
+                    if child not in done:
+                        on_stack.add(child)
+                        stack.append((child, iter(graph.get(child, []))))
+                        break
+                else:
+                    stack.pop()
+                    on_stack.discard(node)
+                    done.add(node)
+                    order.append(node)
+            if computed is None:
+                # nodes below '##' are the computed fields
+                computed = order[-2::-1]
+        positions = dict((node, pos) for pos, node in enumerate(computed))
+        masks = {}
+        for node in order:
+            mask = 1 << positions[node] if node in positions else 0
+            for child in graph.get(node, []):
+                mask |= masks[child]
+            masks[node] = mask
+        return computed, masks
+
+    def _get_graph(self):
+        """
+        Simplified parent-child relation graph.
+        """
+        graph = {}
+        for edge in self.edges:
+            graph.setdefault(edge.left, []).append(edge.right)
+        return graph
 
     def get_topological_paths(self):
         """
         Creates a map of all possible entry nodes and their topological update path
         (computed fields mro).
         """
-        # create simplified parent-child relation graph
-        graph = {}
-        for edge in self.edges:
-            graph.setdefault(edge.left, []).append(edge.right)
+        computed, masks = self._tsort(self._get_graph())
         topological_paths = {}
-
-        # '##' has connections to all cfs thus creates the basic deps order map containing all cfs
-        # it also creates all tpaths between cfs itself
-        topological_paths[Node('##')] = self._tsort(graph, Node('##'), topological_paths, [])[:-1]
-
-        # we still need to reveal concrete field deps
-        # other than for cfs we also strip last entry (the field itself)
-        for node in graph:
-            if node in topological_paths:
-                continue
-            topological_paths[node] = self._tsort(graph, node, topological_paths, [])[:-1]
-
-        # reverse all tpaths
-        for entry, path in topological_paths.items():
-            topological_paths[entry] = path[::-1]
-
+        for node, mask in masks.items():
+            topological_paths[node] = [field for pos, field in enumerate(computed) if mask & (1 << pos)]
         return topological_paths
 
+    def generate_local_masks(self):
+        """
+        Same as ``generate_local_mapping`` for the topological paths, but directly
+        from the bitarrays of ``_tsort`` without creating the paths per field.
+        """
+        computed, masks = self._tsort(self._get_graph())
+        return {
+            'base': [node.data for node in computed],
+            'fields': dict((node.data, mask) for node, mask in masks.items() if node != Node('##'))
+        }
+
     def generate_field_paths(self, tpaths):
         """
         Convert topological path node mapping into a mapping containing the fieldnames.
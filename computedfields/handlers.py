@@ -1,31 +1,427 @@
 """
 Module containing the database signal handlers.
 
-The handlers are registered during application startup
-in ``apps.ready``.
+The handlers are registered per sender during application startup
+in ``apps.ready`` by ``connect_handlers``.
 
 .. NOTE::
 
     The handlers are not registered in the managment
     commands ``makemigrations``, ``migrate`` and ``help``.
+
+By default the handlers update dependent computed fields directly. For many
+saves in a row this can be changed to a deferred mode, where the handlers only
+record the dirty records and apply the updates once at the end (see ``batch``
+and the setting ``COMPUTEDFIELDS_DEFERRED``).
 """
-from threading import local
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import re
+import weakref
 from django.db import transaction
+from django.conf import settings
 from .resolver import active_resolver
 
 
-# thread local storage to hold
-# the pk lists for deletes/updates
-STORAGE = local()
-STORAGE.DELETES = {}
-STORAGE.M2M_REMOVE = {}
-STORAGE.M2M_CLEAR = {}
-STORAGE.UPDATE_OLD = {}
+# context local storage (per thread and asyncio task)
+# for the collectors of the handlers
+BATCH = ContextVar('computedfields_batch', default=None)
+COMMIT = ContextVar('computedfields_commit', default=None)
+DELETE = ContextVar('computedfields_delete', default=None)
+
+# leading keyword of SQL statements
+SQL_KEYWORD = re.compile(r'[\s(]*(\w+)')
+# statements not writing records, that do not trigger the resolve of pending deletes
+NON_WRITING = frozenset((
+    'SELECT', 'WITH', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'SET', 'SHOW'))
+
+
+def context_dict(var):
+    """
+    Returns the dict stored in the context variable `var`,
+    created on first access in the current context.
+    """
+    value = var.get()
+    if value is None:
+        value = {}
+        var.set(value)
+    return value
+
+
+class _CommitBound:
+    """
+    Mixin for objects bound to the current transaction by a ``transaction.on_commit`` hook.
+
+    Django drops the hooks of rolled back atomic blocks, which makes the object stale.
+    As Django replaces the hook list of the connection on any commit or rollback,
+    the list only gets scanned for the hook, if it was replaced since the last check.
+    """
+    _hook_list = None
+
+    def _bind(self, hook, connection):
+        """
+        Register `hook` as commit hook on `connection`.
+        """
+        transaction.on_commit(hook, using=connection.alias)
+        self._hook_list = connection.run_on_commit if connection.in_atomic_block else None
+
+    def _hook_pending(self, hook, connection):
+        """
+        Whether `hook` is still registered on `connection`.
+        """
+        hooks = connection.run_on_commit
+        if hooks is self._hook_list:
+            return True
+        if any(entry[1] == hook for entry in hooks):
+            self._hook_list = hooks
+            return True
+        return False
+
+
+class PendingStore:
+    """
+    Context local storage of pending update data, that a pre signal handler
+    hands over to the post signal handler of an instance.
+
+    Each thread and asyncio task uses its own entries. The entries do not keep
+    their instance alive and are bound to the transaction they were created in:
+    entries left behind by a failed save or m2m change get dropped, when their
+    atomic block got rolled back or committed.
+    """
+    def __init__(self, name):
+        self._entries = ContextVar(name + '_entries', default=None)
+        self._hooks = ContextVar(name + '_hooks', default=None)
+
+    def set(self, instance, data, using=None):
+        """
+        Store `data` for `instance`.
+        """
+        entries = context_dict(self._entries)
+        self._purge(entries)
+        key = id(instance)
+
+        def remove(ref):
+            if entries.get(key, (None,))[0] is ref:
+                del entries[key]
+
+        entries[key] = (weakref.ref(instance, remove), data, self._get_hook(using))
+
+    def pop(self, instance, default=None):
+        """
+        Remove and return the data stored for `instance`.
+        """
+        entries = self._entries.get()
+        if not entries:
+            return default
+        entry = entries.get(id(instance))
+        if entry is None or entry[0]() is not instance:
+            return default
+        del entries[id(instance)]
+        return entry[1]
+
+    def _get_hook(self, using):
+        """
+        Returns the commit hook of the current atomic block on connection `using`,
+        or ``None`` outside of atomic blocks. The hook gets registered once
+        per block and savepoint level.
+        """
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            return None
+        hooks = context_dict(self._hooks)
+        sids = tuple(connection.savepoint_ids)
+        hook = hooks.get(connection.alias)
+        if hook is None or hook.sids != sids or not hook.is_pending():
+            hook = hooks[connection.alias] = _StoreHook(self, connection, sids)
+            hook._bind(hook, connection)
+        return hook
+
+    def _purge(self, entries):
+        """
+        Drop entries of rolled back atomic blocks.
+        """
+        stale = {}
+        for key, (_, _, hook) in list(entries.items()):
+            if hook is None:
+                continue
+            if hook not in stale:
+                stale[hook] = not hook.is_pending()
+            if stale[hook]:
+                del entries[key]
+
+    def _drop(self, hook):
+        entries = self._entries.get()
+        if entries:
+            for key, (_, _, entry_hook) in list(entries.items()):
+                if entry_hook is hook:
+                    del entries[key]
+
+
+class _StoreHook(_CommitBound):
+    """
+    ``transaction.on_commit`` hook of a ``PendingStore``, drops leftover entries
+    of the committed transaction. Django drops the hook on rollbacks, which marks
+    the entries of the atomic block as stale.
+    """
+    def __init__(self, store, connection, sids):
+        self.store = store
+        self.connection = connection
+        self.sids = sids
+
+    def __call__(self):
+        self.store._drop(self)
+
+    def is_pending(self):
+        return self._hook_pending(self, self.connection)
+
+
+# pending updates between pre and post signals
+UPDATE_OLD = PendingStore('computedfields_update_old')
+M2M_REMOVE = PendingStore('computedfields_m2m_remove')
+M2M_CLEAR = PendingStore('computedfields_m2m_clear')
+
+
+class UpdateCollector(_CommitBound):
+    """
+    Collects dirty records from the signal handlers to be updated later on
+    in one go.
+
+    Saved records are tracked as source pks with their `update_fields` per model,
+    resolved records from old relations, deletes and m2m removals as pk map.
+    During ``flush`` the source records get resolved by the lookup map,
+    merged with the pk map and all dependent records get updated once per
+    model and collected fields.
+    """
+    def __init__(self):
+        self.sources = {}       # {model: [pks, update_fields or None]}
+        self.dependents = {}    # pk map {model: [pks, fields]}
+        self.triggers = set()   # models the dependents were resolved from
+
+    def add_source(self, model, pks, update_fields=None):
+        """
+        Mark records of `model` with `pks` as changed in `update_fields`.
+        `update_fields` set to ``None`` denotes a full update.
+        """
+        entry = self.sources.get(model)
+        if entry is None:
+            self.sources[model] = [set(pks), set(update_fields) if update_fields else None]
+            return
+        entry[0].update(pks)
+        if entry[1] is not None:
+            if update_fields:
+                entry[1].update(update_fields)
+            else:
+                entry[1] = None
+
+    def add_dependents(self, data, models):
+        """
+        Add a pk map of already resolved dependent records of changes on `models`.
+        """
+        merge_pk_maps(self.dependents, data)
+        self.triggers.update(models)
+
+    def flush(self):
+        """
+        Update all collected records.
+        """
+        sources, self.sources = self.sources, {}
+        data, self.dependents = self.dependents, {}
+        models, self.triggers = self.triggers, set()
+        for model, [pks, fields] in sources.items():
+            merge_pk_maps(data, active_resolver._pks_for_update(model, pks, fields))
+        models.update(sources)
+        active_resolver._cascade_or_dispatch(models, data)
+
+    def commit(self):
+        """
+        ``transaction.on_commit`` hook to flush the collector.
+        """
+        collectors = COMMIT.get() or {}
+        for alias, collector in list(collectors.items()):
+            if collector is self:
+                del collectors[alias]
+        self.flush()
+
+    def is_pending(self, connection):
+        """
+        Whether the commit hook is still registered on `connection`.
+        Django drops the hook on rollbacks, which makes the collector stale.
+        """
+        return self._hook_pending(self.commit, connection)
+
+
+class DeleteCollector(_CommitBound):
+    """
+    Collects the instances of one deletion from the delete handlers.
+
+    Django sends ``pre_delete`` for all collected instances, before it writes anything
+    to the database. Django has no hook after the last ``pre_delete``, therefore a database
+    execute wrapper watches the statements of the deletion. The instances get recorded
+    per model and resolved right before the first writing statement of the deletion
+    with one pk select per dependent model. After the last ``post_delete`` the merged
+    dependent records get updated once.
+
+    Statements are told apart by their leading keyword: reads (including ``WITH``)
+    and transaction control statements pass, anything else resolves the pending
+    instances. Resolving too early is harmless, instances recorded afterwards
+    get resolved by the next writing statement.
+
+    The collector is bound to the atomic block of the deletion by a commit hook,
+    a rolled back deletion leaves a stale collector behind, that gets replaced.
+    """
+    def __init__(self, using=None):
+        self.connection = transaction.get_connection(using)
+        self.pending = {}       # {model: [pks]} not resolved yet
+        self.waiting = set()    # (model, pk) awaiting post_delete
+        self.dependents = {}    # pk map {model: [pks, fields]}
+        self.models = set()     # deleted models
+        self._bind(self.commit, self.connection)
+
+    def add(self, model, instance):
+        """
+        Record `instance` of `model` for deletion.
+        """
+        if not self.pending:
+            self.connection.execute_wrappers.append(self.resolve_before_write)
+        self.pending.setdefault(model, []).append(instance.pk)
+        self.waiting.add((model, instance.pk))
+        self.models.add(model)
+
+    def resolve_before_write(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper to resolve pending instances before the first
+        writing statement, while the records are still in the database.
+        """
+        if not self.is_pending():
+            # left behind by a rolled back deletion
+            self.discard()
+        else:
+            match = SQL_KEYWORD.match(sql)
+            if not match or match.group(1).upper() not in NON_WRITING:
+                self.resolve()
+        return execute(sql, params, many, context)
+
+    def resolve(self):
+        """
+        Resolve the dependent records of all pending instances.
+        """
+        if self.resolve_before_write in self.connection.execute_wrappers:
+            self.connection.execute_wrappers.remove(self.resolve_before_write)
+        pending, self.pending = self.pending, {}
+        for model, pks in pending.items():
+            merge_pk_maps(self.dependents, active_resolver._querysets_for_update(
+                model, model._base_manager.filter(pk__in=pks), pk_list=True))
 
-DELETES = STORAGE.DELETES
-M2M_REMOVE = STORAGE.M2M_REMOVE
-M2M_CLEAR = STORAGE.M2M_CLEAR
-UPDATE_OLD = STORAGE.UPDATE_OLD
+    def done(self, model, instance):
+        """
+        Mark `instance` of `model` as deleted.
+        Returns ``True`` if all recorded instances are deleted.
+        """
+        if self.pending:  # pragma: no cover
+            self.resolve()
+        self.waiting.discard((model, instance.pk))
+        return not self.waiting
+
+    def commit(self):
+        """
+        ``transaction.on_commit`` hook, only used to spot stale collectors.
+        """
+        collectors = DELETE.get() or {}
+        if collectors.get(self.connection.alias) is self:
+            del collectors[self.connection.alias]
+
+    def is_pending(self):
+        """
+        Whether the commit hook is still registered on the connection.
+        Django drops the hook on rollbacks, which makes the collector stale.
+        """
+        return self._hook_pending(self.commit, self.connection)
+
+    def discard(self):
+        """
+        Drop pending instances of a stale collector.
+        """
+        self.pending = {}
+        if self.resolve_before_write in self.connection.execute_wrappers:
+            self.connection.execute_wrappers.remove(self.resolve_before_write)
+
+
+def get_delete_collector(using=None, create=True):
+    """
+    Returns the ``DeleteCollector`` of the current deletion on the connection `using`.
+    """
+    collectors = context_dict(DELETE)
+    alias = transaction.get_connection(using).alias
+    collector = collectors.get(alias)
+    if collector is not None and not collector.is_pending():
+        collector.discard()
+        collector = collectors[alias] = None
+    if collector is None and create:
+        collector = collectors[alias] = DeleteCollector(alias)
+    return collector
+
+
+@contextmanager
+def batch(using=None):
+    """
+    Context manager to defer dependent computed field updates
+    until the end of the block:
+
+        >>> from computedfields.models import batch
+        >>> with batch():
+        ...     for i in range(500):
+        ...         Child.objects.create(parent=parent)
+
+    Within the block the signal handlers only record the changed records.
+    On exit the records get merged per model and every dependent record is updated once.
+    Computed fields on the saved models itself are still updated by ``save`` as usual.
+
+    The block runs in an atomic block on the database `using`, thus the saves and
+    the dependent updates get committed together. If the block raises an exception,
+    both are rolled back. Nested blocks join the outermost block.
+
+    .. NOTE::
+
+        Dependent computed fields are not in sync until the block is left.
+        Also manual calls to ``update_dependent`` within the block are not deferred.
+    """
+    collector = BATCH.get()
+    if collector is not None:
+        yield collector
+        return
+    collector = UpdateCollector()
+    with transaction.atomic(using=using):
+        token = BATCH.set(collector)
+        try:
+            yield collector
+        finally:
+            BATCH.reset(token)
+        collector.flush()
+
+
+def get_collector(using=None):
+    """
+    Returns the currently active ``UpdateCollector`` or ``None``.
+
+    A collector is active within a ``batch`` block. With ``COMPUTEDFIELDS_DEFERRED = True``
+    in `settings.py` a collector is also created for an atomic block on the connection
+    `using`, which gets flushed by ``transaction.on_commit``.
+    """
+    collector = BATCH.get()
+    if collector is not None:
+        return collector
+    if not getattr(settings, 'COMPUTEDFIELDS_DEFERRED', False):
+        return None
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    collectors = context_dict(COMMIT)
+    collector = collectors.get(connection.alias)
+    if collector is None or not collector.is_pending(connection):
+        collector = collectors[connection.alias] = UpdateCollector()
+        collector._bind(collector.commit, connection)
+    return collector
 
 
 def get_old_handler(sender, instance, **kwargs):
@@ -54,16 +450,33 @@ def get_old_handler(sender, instance, **kwargs):
     # exit early if no contributing fk field will be updated
     if not candidates:
         return
-    # we got an update instance with possibly dirty fk fields
-    # we do simply a full update on all old related fk records for now
-    # FIXME: this might turn out as a major update bottleneck, if so
-    #        filter by individual field changes instead? (tests are ~10% slower)
+    # exit early if no contributing fk value changed since loading or the last save,
+    # instances without a snapshot always read the old relations from the database
+    if not active_resolver._changed_fks(instance, sender, candidates):
+        return
+    # we got an update instance with dirty fk fields
+    # we do simply a full update on all old related fk records
     data = active_resolver.preupdate_dependent(instance, sender)
     if data:
-        UPDATE_OLD[instance] = data
+        UPDATE_OLD.set(instance, data, kwargs.get('using'))
     return
 
 
+def postinit_handler(sender, instance, **_):
+    """
+    ``post_init`` handler.
+
+    With ``COMPUTEDFIELDS_TRACK_CHANGES`` snapshots the contributing fk values
+    of new and loaded instances, which allows ``get_old_handler`` to skip unchanged
+    fk relations, and the field values, that computed fields depend on.
+    Only connected for models with contributing fk fields or tracked fields.
+    """
+    if sender in active_resolver._fk_map:
+        active_resolver._snapshot_fks(instance, sender)
+    if active_resolver._track_changes:
+        active_resolver._snapshot_fields(instance, sender)
+
+
 def postsave_handler(sender, instance, **kwargs):
     """
     ``post_save`` handler.
@@ -71,41 +484,144 @@ def postsave_handler(sender, instance, **kwargs):
     Directly updates dependent objects.
     Skipped during fixtures.
     """
+    if '_computedfields_fks' in instance.__dict__:
+        active_resolver._snapshot_fks(instance, sender)
+    update_fields = kwargs.get('update_fields')
+    unchanged = False
+    if '_computedfields_snapshot' in instance.__dict__:
+        # narrow the update to fields changed since loading or the last save
+        changed = active_resolver._changed_fields(instance, sender)
+        # local computed fields recalculated from changed fields might differ from the database
+        changed.update(active_resolver._local_mro_for(sender, changed))
+        active_resolver._snapshot_fields(instance, sender, update_fields)
+        if update_fields is None and not kwargs.get('created') \
+                and not changed.intersection(active_resolver._fk_map.get(sender, ())):
+            # moved fks need the full update to reach the new relations
+            update_fields = changed
+            unchanged = not changed.intersection(active_resolver._map.get(sender, ()))
     # do not update for fixtures
     if not kwargs.get('raw'):
+        old = UPDATE_OLD.pop(instance, [])
+        collector = get_collector(kwargs.get('using'))
+        if collector:
+            if sender in active_resolver._map and not unchanged:
+                collector.add_source(sender, [instance.pk], update_fields)
+            if old:
+                collector.add_dependents(old, [sender])
+            return
+        if unchanged:
+            # no field changed, that dependent computed fields rely on,
+            # old relations still follow the consistency level of the model
+            if old:
+                active_resolver._cascade_or_dispatch([sender], old)
+            return
         active_resolver.update_dependent(
-            instance, sender, kwargs.get('update_fields'),
-            old=UPDATE_OLD.pop(instance, []), update_local=False
+            instance, sender, update_fields,
+            old=old, update_local=False
         )
 
 
-def predelete_handler(sender, instance, **_):
+def predelete_handler(sender, instance, **kwargs):
     """
     ``pre_delete`` handler.
 
-    Gets all dependent objects as pk lists and saves
-    them in thread local storage.
+    Records the instance in the ``DeleteCollector`` of the deletion.
+    The dependent records of all instances of a deletion get resolved at once
+    before the records are removed from the database.
     """
-    # get the querysets as pk lists to hold them in storage
-    # we have to get pks here since the queryset will be empty after deletion
-    data = active_resolver._querysets_for_update(sender, instance, pk_list=True)
-    if data:
-        DELETES[instance] = data
+    get_delete_collector(kwargs.get('using')).add(sender, instance)
 
 
 def postdelete_handler(sender, instance, **kwargs):
     """
     ``post_delete`` handler.
 
-    Loads the dependent objects from the previously saved pk lists
-    and updates them.
+    Updates the merged dependent records of a deletion
+    after the last instance was deleted.
     """
+    delete_collector = get_delete_collector(kwargs.get('using'), create=False)
+    if not delete_collector or not delete_collector.done(sender, instance):
+        return
     # after deletion we can update the associated computed fields
-    updates = DELETES.pop(instance, None)
+    DELETE.get().pop(delete_collector.connection.alias)
+    updates = delete_collector.dependents
     if updates:
-        with transaction.atomic():
-            for model, [pks, fields] in updates.items():
-                active_resolver.bulk_updater(model.objects.filter(pk__in=pks), fields)
+        collector = get_collector(kwargs.get('using'))
+        if collector:
+            collector.add_dependents(updates, delete_collector.models)
+            return
+        active_resolver._cascade_or_dispatch(delete_collector.models, updates)
+
+
+def get_senders(resolver):
+    """
+    Returns a mapping of the handlers to the models they are needed for by `resolver`.
+    Models not contained in the resolver maps are not handled at all.
+    """
+    fk_models = set(resolver._fk_map)
+    save_models = set(resolver._map) | fk_models
+    init_models = set()
+    if resolver._track_changes:
+        save_models.update(resolver._local_mro)
+        init_models.update(fk_models, resolver._map, resolver._local_mro)
+    return {
+        'COMP_FIELD_PRESAVE': fk_models,
+        'COMP_FIELD': save_models,
+        'COMP_FIELD_PREDELETE': set(resolver._map),
+        'COMP_FIELD_POSTDELETE': set(resolver._map),
+        'COMP_FIELD_M2M': set(resolver._m2m),
+        'COMP_FIELD_POSTINIT': init_models,
+    }
+
+
+# handlers by dispatch_uid and the senders they are currently connected for
+CONNECTED = {}
+
+
+def connect_handlers(resolver=active_resolver):
+    """
+    Connect the signal handlers per sender for the models in the resolver maps.
+
+    Called by ``app.ready`` and again by ``resolver.load_maps`` for changed maps,
+    which connects handlers for new senders and disconnects outdated ones.
+    Saves and deletes of other models do not pay for the handler dispatch.
+    """
+    from django.db.models.signals import (
+        post_save, m2m_changed, pre_delete, post_delete, pre_save, post_init)
+    handlers = {
+        'COMP_FIELD_PRESAVE': (pre_save, get_old_handler),
+        'COMP_FIELD': (post_save, postsave_handler),
+        'COMP_FIELD_PREDELETE': (pre_delete, predelete_handler),
+        'COMP_FIELD_POSTDELETE': (post_delete, postdelete_handler),
+        'COMP_FIELD_M2M': (m2m_changed, m2m_handler),
+        'COMP_FIELD_POSTINIT': (post_init, postinit_handler),
+    }
+    for uid, senders in get_senders(resolver).items():
+        signal, handler = handlers[uid]
+        connected = CONNECTED.setdefault(uid, set())
+        for model in connected - senders:
+            signal.disconnect(sender=model, dispatch_uid=uid)
+        for model in senders - connected:
+            signal.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        CONNECTED[uid] = senders
+    # snapshots taken by post_init need a refresh on reloads
+    for model in CONNECTED['COMP_FIELD_POSTINIT']:
+        if not hasattr(model.refresh_from_db, '_computedfields_refresh'):
+            model.refresh_from_db = _snapshot_refresh(model.refresh_from_db)
+    resolver._handlers_connected = True
+
+
+def _snapshot_refresh(refresh_from_db):
+    """
+    Wraps ``refresh_from_db`` of a model to update the snapshots of reloaded fields.
+    Django reloads into a separate instance, thus ``post_init`` does not see the refresh.
+    """
+    @wraps(refresh_from_db)
+    def wrapper(self, using=None, fields=None, **kwargs):
+        refresh_from_db(self, using=using, fields=fields, **kwargs)
+        active_resolver._refresh_snapshots(self, type(self), fields)
+    wrapper._computedfields_refresh = refresh_from_db
+    return wrapper
 
 
 def merge_pk_maps(obj1, obj2):
@@ -119,16 +635,6 @@ def merge_pk_maps(obj1, obj2):
         m1_fields.update(m2_fields)
     return obj1
 
-def merge_qs_maps(obj1, obj2):
-    """
-    Merge queryset map in `obj2` on `obj1`.
-    """
-    for model, [qs2, fields2] in obj2.items():
-        query_field = obj1.setdefault(model, [model.objects.none(), set()])
-        query_field[0] |= qs2            # or'ed querysets
-        query_field[1].update(fields2)   # add fields
-    return obj1
-
 def m2m_handler(sender, instance, **kwargs):
     """
     ``m2m_change`` handler.
@@ -146,7 +652,8 @@ def m2m_handler(sender, instance, **kwargs):
         return
 
     # since the graph does not handle the m2m through model
-    # we have to trigger updates for both ends (left and right side)
+    # we have to trigger updates for both ends (left and right side),
+    # both sides are resolved by their pks only
     reverse = kwargs['reverse']
     left = fields['right'] if reverse else fields['left']   # fieldname on instance
     right = fields['left'] if reverse else fields['right']  # fieldname on model
@@ -155,48 +662,46 @@ def m2m_handler(sender, instance, **kwargs):
 
     if action == 'post_add':
         pks = kwargs['pk_set']
-        data = active_resolver._querysets_for_update(
-            type(instance), instance, update_fields=[left])
-        other = active_resolver._querysets_for_update(
-            model, model.objects.filter(pk__in=pks), update_fields=[right])
-        if other:
-            merge_qs_maps(data, other)
-        if data:
-            with transaction.atomic():
-                for queryset, fields in data.values():
-                    active_resolver.bulk_updater(queryset, fields)
+        collector = get_collector(kwargs.get('using'))
+        if collector:
+            # repeated adds within the batch or transaction get merged per model
+            collector.add_source(type(instance), [instance.pk], [left])
+            collector.add_source(model, pks, [right])
+            return
+        data = active_resolver._pks_for_update(type(instance), [instance.pk], [left])
+        merge_pk_maps(data, active_resolver._pks_for_update(model, pks, [right]))
+        active_resolver._cascade_or_dispatch((type(instance), model), data)
 
     elif action == 'pre_remove':
-        pks = kwargs['pk_set']
-        data = active_resolver._querysets_for_update(
-            type(instance), instance, update_fields=[left], pk_list=True)
-        other = active_resolver._querysets_for_update(
-            model, model.objects.filter(pk__in=pks), update_fields=[right], pk_list=True)
-        if other:
-            merge_pk_maps(data, other)
+        data = active_resolver._pks_for_update(type(instance), [instance.pk], [left])
+        merge_pk_maps(data, active_resolver._pks_for_update(model, kwargs['pk_set'], [right]))
         if data:
-            M2M_REMOVE[instance] = data
+            M2M_REMOVE.set(instance, data, kwargs.get('using'))
 
     elif action == 'post_remove':
         updates = M2M_REMOVE.pop(instance, None)
         if updates:
-            with transaction.atomic():
-                for _model, [pks, fields] in updates.items():
-                    active_resolver.bulk_updater(_model.objects.filter(pk__in=pks), fields)
+            collector = get_collector(kwargs.get('using'))
+            if collector:
+                collector.add_dependents(updates, (type(instance), model))
+                return
+            active_resolver._cascade_or_dispatch((type(instance), model), updates)
 
     elif action == 'pre_clear':
-        data = active_resolver._querysets_for_update(
-            type(instance), instance, update_fields=[left], pk_list=True)
-        other = active_resolver._querysets_for_update(
-            model, getattr(instance, left).all(), update_fields=[right], pk_list=True)
-        if other:
-            merge_pk_maps(data, other)
+        # pks of the other side straight from the through table
+        manager = getattr(instance, left)
+        pks = manager.through._base_manager.filter(
+            **{manager.source_field_name: instance.pk}).values_list(manager.target_field.attname, flat=True)
+        data = active_resolver._pks_for_update(type(instance), [instance.pk], [left])
+        merge_pk_maps(data, active_resolver._pks_for_update(model, pks, [right]))
         if data:
-            M2M_CLEAR[instance] = data
+            M2M_CLEAR.set(instance, data, kwargs.get('using'))
 
     elif action == 'post_clear':
         updates = M2M_CLEAR.pop(instance, None)
         if updates:
-            with transaction.atomic():
-                for _model, [pks, fields] in updates.items():
-                    active_resolver.bulk_updater(_model.objects.filter(pk__in=pks), fields)
+            collector = get_collector(kwargs.get('using'))
+            if collector:
+                collector.add_dependents(updates, (type(instance), model))
+                return
+            active_resolver._cascade_or_dispatch((type(instance), model), updates)
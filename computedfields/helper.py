@@ -1,5 +1,14 @@
 from itertools import tee, zip_longest
 
+from django.apps import apps
+from django.db import connections
+
+
+class ComputedFieldsException(Exception):
+    """
+    Base exception raised from computed fields.
+    """
+
 
 def pairwise(iterable):
     a, b = tee(iterable)
@@ -56,3 +65,117 @@ def skip_equal_segments(ps, rs):
         if add:
             ret.append(left)
     return ret
+
+
+def strongly_connected(successors, nodes):
+    """
+    Returns the strongly connected components of the subgraph of `nodes`
+    as list of node sets (iterative Tarjan algorithm). `successors` is an adjacency
+    mapping of ``{node: set(child nodes)}``. The components are returned in reverse
+    topological order.
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in nodes:
+                    continue
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
+
+
+def pk_ranges(queryset, size, last=None):
+    """
+    Generator of ``(first, last)`` pk ranges over `queryset` with at most `size` records,
+    starting after the pk `last`.
+    """
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        pks = list((queryset.filter(pk__gt=last) if last is not None else queryset)[:size])
+        if not pks:
+            return
+        last = pks[-1]
+        yield pks[0], last
+
+
+def process_init():
+    """
+    Initializer of worker processes, drops the database connections
+    inherited from the parent process.
+    """
+    # drop inherited connections without closing them,
+    # as they are still in use by the parent process
+    for conn in connections.all():
+        conn.connection = None
+
+
+def get_models(labels):
+    """
+    Returns ``(model, fields)`` pairs for the model labels `labels` in topological order,
+    where `fields` is ``None`` for all computed fields of the model. Without `labels`
+    all computed models are returned.
+
+    Raises ``ComputedFieldsException`` for unknown models or fields.
+    """
+    from .resolver import active_resolver
+    computed_models = active_resolver.computed_models
+    if not labels:
+        selected = dict((model, None) for model in computed_models)
+    else:
+        selected = {}
+        for label in labels:
+            parts = label.split('.')
+            model_label = '.'.join(parts[:2])
+            try:
+                if len(parts) not in (2, 3):
+                    raise ValueError
+                model = apps.get_model(model_label)
+            except (LookupError, ValueError):
+                raise ComputedFieldsException('unknown model "{}"'.format(model_label))
+            if model not in computed_models:
+                raise ComputedFieldsException('model "{}" has no computed fields'.format(model_label))
+            if len(parts) == 2:
+                selected[model] = None
+                continue
+            if parts[2] not in computed_models[model]:
+                raise ComputedFieldsException('"{}" is not a computed field of "{}"'.format(parts[2], model_label))
+            if selected.setdefault(model, set()) is not None:
+                selected[model].add(parts[2])
+    rank = active_resolver._model_rank
+    return sorted(selected.items(), key=lambda item: (rank.get(item[0], 0), item[0]._meta.label))
+
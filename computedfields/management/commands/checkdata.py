@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from computedfields.models import active_resolver
+from computedfields.helper import pk_ranges, process_init, get_models, ComputedFieldsException
+
+
+def check_chunk(label, fields, first, last, samples):
+    """
+    Recompute computed `fields` of model `label` for records in the pk range `first` to `last`
+    without saving them.
+
+    Returns the number of checked records, a mapping of drifted fields
+    to ``[count, sample_pks]`` and the pks of drifted records.
+    """
+    model = apps.get_model(label)
+    queryset = model._base_manager.filter(pk__gte=first, pk__lte=last)
+    plan = active_resolver.get_plan(model, set(fields) if fields else None)
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*plan.prefetch_related)
+    drift = {}
+    instances = list(queryset)
+    drifted = {}
+    for fieldname in plan.mro:
+        # keep recomputed values on the instances, as later fields in mro might depend on them
+        values = active_resolver._compute_chunk(instances, model, fieldname)
+        for elem, value in zip(instances, values):
+            if value != getattr(elem, fieldname):
+                setattr(elem, fieldname, value)
+                entry = drift.setdefault(fieldname, [0, []])
+                entry[0] += 1
+                if len(entry[1]) < samples:
+                    entry[1].append(elem.pk)
+                drifted[elem.pk] = None
+    return len(instances), drift, list(drifted)
+
+
+class Command(BaseCommand):
+    help = 'Check stored computed field values against recomputed values.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'labels',
+            nargs='*',
+            metavar='app_label.ModelName[.fieldname]',
+            help='restrict the check to certain models or computed fields (default all)'
+        )
+        parser.add_argument(
+            '--chunksize',
+            type=int,
+            default=active_resolver._querysize,
+            help='number of records checked at once (default COMPUTEDFIELDS_QUERYSIZE)'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=0,
+            help='check the chunks of a model in N worker processes'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=10,
+            help='number of drifted pks listed per field (default 10)'
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='update drifted records including their dependent computed fields'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            models = get_models(options['labels'])
+        except ComputedFieldsException as exc:
+            raise CommandError(str(exc))
+        pool = ProcessPoolExecutor(options['processes'], initializer=process_init) \
+            if options['processes'] else None
+        total = 0
+        try:
+            for model, fields in models:
+                total += self.check_model(model, fields, pool, options)
+        finally:
+            if pool:
+                pool.shutdown()
+        if total and not options['repair']:
+            raise CommandError('found {} drifted computed field values'.format(total))
+
+    def check_model(self, model, fields, pool, options):
+        """
+        Check `model` in pk ordered chunks and report the drifted fields.
+        With ``--repair`` the drifted records of a chunk are updated in the main process.
+        Returns the number of drifted values.
+        """
+        label = model._meta.label
+        fields = sorted(fields) if fields else None
+        chunks = pk_ranges(model._base_manager.all(), options['chunksize'])
+        if pool:
+            futures = [pool.submit(check_chunk, label, fields, first, last, options['samples'])
+                       for first, last in chunks]
+            results = (future.result() for future in futures)
+        else:
+            results = (check_chunk(label, fields, first, last, options['samples']) for first, last in chunks)
+        rows = 0
+        drift = {}
+        for chunk_rows, chunk_drift, drifted in results:
+            rows += chunk_rows
+            for fieldname, (count, pks) in chunk_drift.items():
+                entry = drift.setdefault(fieldname, [0, []])
+                entry[0] += count
+                entry[1].extend(pks[:options['samples'] - len(entry[1])])
+            if options['repair'] and drifted:
+                # also updates dependent computed fields of other models
+                with transaction.atomic():
+                    active_resolver.bulk_updater(model._base_manager.filter(pk__in=drifted), set(chunk_drift))
+        total = sum(count for count, _ in drift.values())
+        if options['verbosity'] and (total or options['verbosity'] > 1):
+            self.stdout.write('{}: {} rows checked, {} drifted values{}'.format(
+                label, rows, total, ' (repaired)' if total and options['repair'] else ''))
+            for fieldname, (count, pks) in sorted(drift.items()):
+                self.stdout.write('  {}: {} (pks {}{})'.format(
+                    fieldname, count, ', '.join(str(pk) for pk in pks), ', ...' if count > len(pks) else ''))
+        return total
@@ -4,10 +4,10 @@ from computedfields.models import active_resolver
 
 
 class Command(BaseCommand):
-    help = 'Pickle dependency lookup map for computed fields to file.'
+    help = 'Write compiled dependency lookup map for computed fields to file.'
 
     def handle(self, *args, **options):
-        if not hasattr(settings, 'COMPUTEDFIELDS_MAP'):
+        if not hasattr(settings, 'COMPUTEDFIELDS_MAP') and not hasattr(settings, 'COMPUTEDFIELDS_MAP_DIR'):
             raise CommandError('COMPUTEDFIELDS_MAP is not set in settings.py, abort.')
 
-        active_resolver._write_pickled_data()
+        active_resolver._write_map()
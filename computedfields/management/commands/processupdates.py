@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from computedfields.executors import process_queue
+
+
+class Command(BaseCommand):
+    help = 'Process queued dependency updates of models with eventual consistency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='keep polling the queue instead of exiting when it is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='seconds to wait between polls of an empty queue (default 1)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='max. number of jobs to process per poll'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = process_queue(options['limit'])
+            if done and options['verbosity'] > 1:
+                self.stdout.write('processed {} jobs'.format(done))
+            if not options['loop']:
+                break
+            if not done:
+                time.sleep(options['interval'])
@@ -1,13 +1,130 @@
-from django.core.management.base import BaseCommand
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from computedfields.models import active_resolver
+from computedfields.helper import pk_ranges, process_init, get_models, ComputedFieldsException
+
+
+def update_chunk(label, fields, first, last, local_only):
+    """
+    Update computed `fields` of model `label` for records in the pk range `first` to `last`.
+    Returns the number of processed records.
+    """
+    model = apps.get_model(label)
+    queryset = model._base_manager.filter(pk__gte=first, pk__lte=last)
+    with transaction.atomic():
+        pks = active_resolver.bulk_updater(
+            queryset, set(fields) if fields else None, return_pks=True, local_only=local_only)
+    return len(pks)
 
 
 class Command(BaseCommand):
     help = 'Update data for computed fields.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'labels',
+            nargs='*',
+            metavar='app_label.ModelName[.fieldname]',
+            help='restrict the update to certain models or computed fields (default all)'
+        )
+        parser.add_argument(
+            '--chunksize',
+            type=int,
+            default=active_resolver._querysize,
+            help='number of records updated per transaction (default COMPUTEDFIELDS_QUERYSIZE)'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=0,
+            help='update the chunks of a model in N worker processes'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=None,
+            help='file to save the progress to, a later run with the same file resumes from there'
+        )
+
     def handle(self, *args, **options):
-        # simply run save on all computed models for now
-        # dependencies will be resolved by the post_save handler
-        for model in active_resolver.computed_models:
-            for obj in model.objects.all():
-                obj.save()
+        self.verbosity = options['verbosity']
+        self.chunksize = options['chunksize']
+        self.checkpoint = options['checkpoint']
+        self.progress = self.load_checkpoint()
+        try:
+            models = get_models(options['labels'])
+        except ComputedFieldsException as exc:
+            raise CommandError(str(exc))
+        pool = ProcessPoolExecutor(options['processes'], initializer=process_init) \
+            if options['processes'] else None
+        try:
+            for model, fields in models:
+                label = model._meta.label
+                if label in self.progress['done']:
+                    continue
+                self.update_model(model, fields, pool, not options['labels'])
+                self.progress['done'].append(label)
+                self.progress['last'].pop(label, None)
+                self.save_checkpoint()
+        finally:
+            if pool:
+                pool.shutdown()
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    def update_model(self, model, fields, pool, full):
+        """
+        Update `model` in pk ordered chunks.
+
+        For a full update dependent models are left to their own turn, except for models
+        within a dependency cycle. Those and partial updates also update their dependents,
+        and are not distributed to worker processes.
+        """
+        label = model._meta.label
+        local_only = full and model not in active_resolver._get_reach(model)
+        fields = sorted(fields) if fields else None
+        start = time.perf_counter()
+        rows = 0
+        if pool and local_only:
+            futures = [(last, pool.submit(update_chunk, label, fields, first, last, local_only))
+                       for first, last in self.get_chunks(model)]
+            for last, future in futures:
+                rows += future.result()
+                self.progress['last'][label] = last
+                self.save_checkpoint()
+        else:
+            for first, last in self.get_chunks(model):
+                rows += update_chunk(label, fields, first, last, local_only)
+                self.progress['last'][label] = last
+                self.save_checkpoint()
+        if self.verbosity:
+            duration = time.perf_counter() - start
+            self.stdout.write('{}: {} rows in {:.2f}s ({:.0f} rows/s)'.format(
+                label, rows, duration, rows / duration if duration else 0))
+
+    def get_chunks(self, model):
+        """
+        Generator of ``(first, last)`` pk ranges of at most `chunksize` records,
+        starting after the pk saved in the checkpoint.
+        """
+        return pk_ranges(model._base_manager.all(), self.chunksize, self.progress['last'].get(model._meta.label))
+
+    def load_checkpoint(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                return json.load(f)
+        return {'done': [], 'last': {}}
+
+    def save_checkpoint(self):
+        if not self.checkpoint:
+            return
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.progress, f, cls=DjangoJSONEncoder)
+        os.replace(tmp, self.checkpoint)
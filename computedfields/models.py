@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 from .resolver import active_resolver, _ComputedFieldsModelBase
+from .handlers import batch as _batch
 
 
 class ComputedFieldsModel(_ComputedFieldsModelBase, models.Model):
@@ -9,6 +10,11 @@ class ComputedFieldsModel(_ComputedFieldsModelBase, models.Model):
     Abstract base class for models with computed fields. Overloads ``save`` to update
     local computed field values before they are written to the database.
 
+    With ``COMPUTEDFIELDS_TRACK_CHANGES = True`` in `settings.py` loaded instances keep
+    a snapshot of field values, that computed fields depend on. A later ``save`` without
+    `update_fields` only recalculates the local computed fields and updates the dependent
+    computed fields of the fields, that actually changed.
+
     All models containing a computed field must be derived from this class.
     """
     class Meta:
@@ -27,7 +33,14 @@ class ComputedFieldsModel(_ComputedFieldsModelBase, models.Model):
         the instance or by a later ``update_dependent`` call.
         """
         if not skip_computedfields:
-            update_fields = update_computedfields(self, update_fields)
+            changed = None
+            if update_fields is None and active_resolver._track_changes and not self._state.adding:
+                changed = active_resolver._changed_fields(self, type(self))
+            if changed is not None:
+                # only recalculate computed fields depending on changed fields, still saving all fields
+                update_computedfields(self, changed)
+            else:
+                update_fields = update_computedfields(self, update_fields)
         return super(ComputedFieldsModel, self).save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
 
 
@@ -52,6 +65,16 @@ update_dependent_multi = active_resolver.update_dependent_multi
 preupdate_dependent = active_resolver.preupdate_dependent
 #: Convenient access to :meth:`preupdate_dependent_multi<.resolver.Resolver.preupdate_dependent_multi>`.
 preupdate_dependent_multi = active_resolver.preupdate_dependent_multi
+#: Convenient access to :meth:`aupdate_dependent<.resolver.Resolver.aupdate_dependent>`.
+aupdate_dependent = active_resolver.aupdate_dependent
+#: Convenient access to :meth:`aupdate_dependent_multi<.resolver.Resolver.aupdate_dependent_multi>`.
+aupdate_dependent_multi = active_resolver.aupdate_dependent_multi
+#: Convenient access to :meth:`apreupdate_dependent<.resolver.Resolver.apreupdate_dependent>`.
+apreupdate_dependent = active_resolver.apreupdate_dependent
+#: Convenient access to :meth:`apreupdate_dependent_multi<.resolver.Resolver.apreupdate_dependent_multi>`.
+apreupdate_dependent_multi = active_resolver.apreupdate_dependent_multi
+#: Convenient access to :func:`batch<.handlers.batch>`.
+batch = _batch
 
 # helper
 #: Convenient access to :meth:`has_computedfields<.resolver.Resolver.has_computedfields>`.
@@ -112,3 +135,22 @@ class ContributingModelsModel(ContentType):
         verbose_name = _('Model with contributing ForeignKey Fields')
         verbose_name_plural = _('Models with contributing ForeignKey Fields')
         ordering = ('app_label', 'model')
+
+
+class UpdateJob(models.Model):
+    """
+    Queued dependency update for models with ``'eventual'`` consistency.
+    The queue is processed by the management command ``processupdates``.
+
+    Failed runs are counted in `attempts` with the last error in `error`. Jobs reaching
+    ``COMPUTEDFIELDS_QUEUE_RETRIES`` attempts are left in the table for inspection.
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    data = models.TextField()
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name = _('Update Job')
+        verbose_name_plural = _('Update Jobs')
+        ordering = ('pk',)
@@ -2,19 +2,36 @@
 Contains the resolver logic for automated computed field updates.
 """
 
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
 from threading import RLock
 from hashlib import sha256
 import logging
-import pickle
-
-from django.db import transaction
+import marshal
+import os
+import tempfile
+import tracemalloc
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:  # pragma: no cover
+    sync_to_async = None
+
+from django.apps import apps
+from django.db import transaction, connections
 from django.db.models import QuerySet
 from django.conf import settings
 from django.core.exceptions import FieldDoesNotExist
 
-from .graph import ComputedModelsGraph, ComputedFieldsException
-from .helper import modelname
+from .helper import modelname, strongly_connected, ComputedFieldsException
+from . import executors
 from . import __version__
 
 logger = logging.getLogger(__name__)
@@ -26,6 +43,18 @@ class ResolverException(ComputedFieldsException):
     """
 
 
+#: Precompiled update plan of a model for certain `update_fields`.
+#:
+#:  - `mro`: local computed fields to be updated in order
+#:  - `runs`: `mro` split into runs of method and expression fields
+#:  - `select_related`, `prefetch_related`: stacked query optimizations of `mro`
+#:  - `dependents`: ``(model, fields, paths)`` entries of dependent models
+UpdatePlan = namedtuple('UpdatePlan', 'mro runs select_related prefetch_related dependents')
+
+#: Version of the compiled map format, map files of other versions are treated as outdated.
+MAP_VERSION = 3
+
+
 class Resolver:
     """
     Holds the needed data for graph calculations and runtime dependency resolving.
@@ -37,19 +66,20 @@ class Resolver:
         - On `app.ready` the computed fields are associated with their models to build
           a resolver-wide map of models with computed fields (``computed_models``).
         - After that the resolver maps get loaded, either by building from scratch or
-          by loading them from a pickled map file.
+          by loading them from a compiled map file.
 
     .. NOTE::
 
         To avoid the rather expensive map creation from scratch in production mode later on
-        the map data should be pickled into a map file by setting ``COMPUTEDFIELDS_MAP``
+        the map data should be compiled into a map file by setting ``COMPUTEDFIELDS_MAP``
         in `settings.py` to a writable file path and calling the management
         command ``createmap``.
 
-        Currently the map file does not support automatic recreation, therefore it must be
-        recreated manually by calling ``createmap`` after model code changes. The resolver
-        tracks changes to dependency rules and might warn you about an outdated map file.
-        An outdated map file will not be used, instead a full graph reduction will be done.
+        The resolver tracks changes to dependency rules by a hash of the computed models.
+        A missing or outdated map file gets recreated once under a file lock, other processes
+        wait for the lock and load the new map file. With ``COMPUTEDFIELDS_MAP_DIR``
+        the map files are stored by their hash, thus different code versions can share
+        the directory during rolling deploys.
     """
     _lock = RLock()
 
@@ -67,8 +97,24 @@ class Resolver:
         self._map = {}
         self._fk_map = {}
         self._local_mro = {}
+        self._mro_cache = {}
+        self._fk_attnames = {}
+        self._tracked_attnames = {}
+        self._model_rank = {}
+        self._model_reach = {}
         self._m2m = {}
+        self._related = {}
         self._batchsize = getattr(settings, 'COMPUTEDFIELDS_BATCHSIZE', 100)
+        self._querysize = getattr(settings, 'COMPUTEDFIELDS_QUERYSIZE', 10000)
+        self._plancache = getattr(settings, 'COMPUTEDFIELDS_PLANCACHE', 512)
+        self._parallel = getattr(settings, 'COMPUTEDFIELDS_PARALLEL', 0)
+        self._track_changes = getattr(settings, 'COMPUTEDFIELDS_TRACK_CHANGES', False)
+        self._pool = None
+        self._handlers_connected = False
+        self._plan = lru_cache(maxsize=self._plancache)(self._compile_plan)
+
+        #: Runtime statistics of the resolver (see ``reset_stats``).
+        self.stats = {}
 
         # some internal states
         self._sealed = False        # initial boot phase
@@ -191,7 +237,7 @@ class Resolver:
         """
         Load all needed resolver maps.
 
-        Without providing a pickled map file the calculations are done
+        Without providing a compiled map file the calculations are done
         once per process by ``app.ready``. The steps are:
 
             - create intermodel graph of the dependencies
@@ -203,50 +249,73 @@ class Resolver:
                 - `lookup_map`: intermodel dependencies as queryset access strings
                 - `fk_map`: models with their contributing fk fields
                 - `local_mro`: MRO of local computed fields per model
+                - `m2m`: m2m through models with their left/right field names
+                - `model_rank`: topological rank of models in the lookup map
+                - `related`: query optimizations of computed fields derived from `depends`
 
         These initial graph reduction calculations can get expensive for complicated
         computed field usage in a project. Therefore you should consider setting
-        ``COMPUTEDFIELDS_MAP`` in `settings.py` and create a pickled map file with
-        the management command ``createmap`` in multi process environments.
+        ``COMPUTEDFIELDS_MAP`` or ``COMPUTEDFIELDS_MAP_DIR`` in `settings.py` and create
+        a compiled map file with the management command ``createmap`` in multi process environments.
+        Loading a compiled map does not need the graph module, and the update plans
+        are compiled lazily per model on first usage. A missing or outdated map file
+        gets recreated by the first process (see ``_regenerate_map``).
         """
         with self._lock:
             if self._map_loaded and not _force_recreation:  # pragma: no cover
                 return
 
-            maps = None
-            if getattr(settings, 'COMPUTEDFIELDS_MAP', False) and not _force_recreation:
-                maps = self._load_pickled_data()
+            graph = maps = None
+            path = None if _force_recreation else self._map_path()
+            if path:
+                maps = self._load_map(path)
                 if maps:
                     logger.info('COMPUTEDFIELDS_MAP successfully loaded.')
                 else:
-                    logger.warning('COMPUTEDFIELDS_MAP is outdated, doing a full bootstrap.')
+                    graph, maps = self._regenerate_map(path)
 
             if not maps:
-                self._graph, maps = self._graph_reduction()
+                graph, maps = self._graph_reduction()
+            self._graph = graph
             self._map = maps['lookup_map']
             self._fk_map = maps['fk_map']
             self._local_mro = maps['local_mro']
-            self._extract_m2m_through()
+            self._m2m = maps['m2m']
+            self._related = maps['related']
+            self._mro_cache = {}
+            self._fk_attnames = {}
+            self._tracked_attnames = {}
+            self._init_plans(precompile=graph is not None)
+            self._init_model_order(maps['model_rank'])
             self._map_loaded = True
+            if self._handlers_connected:
+                # resync the per sender signal handlers with the new maps
+                from .handlers import connect_handlers
+                connect_handlers(self)
 
     def _graph_reduction(self):
         """
         Creates resolver maps from full graph reduction.
         """
+        from .graph import ComputedModelsGraph
         graph = ComputedModelsGraph(self.computed_models)
         if not getattr(settings, 'COMPUTEDFIELDS_ALLOW_RECURSION', False):
             graph.remove_redundant()
-            graph.get_uniongraph().get_edgepaths()
-        return (graph, {'lookup_map': graph.generate_lookup_map(),
+            graph.get_uniongraph().get_topological_order()
+        lookup_map = graph.generate_lookup_map()
+        return (graph, {'lookup_map': lookup_map,
                         'fk_map': graph._fk_map,
-                        'local_mro': graph.generate_local_mro_map()})
+                        'local_mro': graph.generate_local_mro_map(),
+                        'm2m': self._extract_m2m_through(),
+                        'related': graph.generate_related_map(),
+                        'model_rank': self._rank_models(lookup_map)})
 
     def _extract_m2m_through(self):
         """
         Creates M2M through model mappings with left/right field names.
         The map is used by the m2m_changed handler for faster name lookups.
-        This cannot be pickled, thus is built for every resolver bootstrapping.
         """
+        m2m = {}
         for model, fields in self.computed_models.items():
             for field, real_field in fields.items():
                 depends = real_field._computed['depends']
@@ -259,20 +328,21 @@ class Resolver:
                             rel = cls._meta.get_field(symbol)
                             if rel.many_to_many:
                                 if hasattr(rel, 'through'):
-                                    self._m2m[rel.through] = {
+                                    m2m[rel.through] = {
                                         'left': rel.remote_field.name, 'right': rel.name}
                                 else:
-                                    self._m2m[rel.remote_field.through] = {
+                                    m2m[rel.remote_field.through] = {
                                         'left': rel.name, 'right': rel.remote_field.name}
                         except FieldDoesNotExist:
                             descriptor = getattr(cls, symbol)
                             rel = getattr(descriptor, 'rel', None) or getattr(descriptor, 'related')
                         cls = rel.related_model
+        return m2m
 
     def _calc_modelhash(self):
         """
         Create a hash from computed models data. This is used to determine,
-        whether a pickled map is outdated.
+        whether a compiled map is outdated.
 
         To create a reliable hash, this method must account the exact same
         input data the graphs use for the map creation. Currently used:
@@ -292,29 +362,139 @@ class Resolver:
             data.append(modelname(models) + ''.join(sorted(field_data)))
         return sha256(''.join(sorted(data)).encode('utf-8')).hexdigest()
 
-    def _load_pickled_data(self):
+    def _map_path(self):
+        """
+        Path of the compiled map file. With ``COMPUTEDFIELDS_MAP_DIR`` set the map file
+        is named by the computed models hash within that directory, otherwise
+        the path is taken from ``COMPUTEDFIELDS_MAP``.
         """
-        Load pickled resolver maps from path in ``COMPUTEDFIELDS_MAP``.
+        mapdir = getattr(settings, 'COMPUTEDFIELDS_MAP_DIR', None)
+        if mapdir:
+            return os.path.join(mapdir, '{}.map'.format(self._calc_modelhash()))
+        return getattr(settings, 'COMPUTEDFIELDS_MAP', None)
 
-        Discards loaded data if the computed model hashs are not equal.
+    def _load_map(self, path=None):
         """
-        with open(settings.COMPUTEDFIELDS_MAP, 'rb') as mapfile:
-            data = pickle.load(mapfile)
-            if self._calc_modelhash() == data.get('hash'):
-                return data
+        Load compiled resolver maps from `path` (defaults to ``_map_path``).
 
-    def _write_pickled_data(self):
+        The map file stores models by their label, which get resolved from the app registry.
+        Discards loaded data if the file is not readable, has a different format version
+        or the computed model hashs are not equal.
         """
-        Pickle resolver maps to path in ``COMPUTEDFIELDS_MAP``.
+        try:
+            with open(path or self._map_path(), 'rb') as mapfile:
+                data = marshal.loads(mapfile.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (not isinstance(data, dict) or data.get('version') != MAP_VERSION
+                or data.get('hash') != self._calc_modelhash()):
+            return None
+        models = {}
+
+        def get_model(label):
+            try:
+                return models[label]
+            except KeyError:
+                model = models[label] = apps.get_model(label)
+                return model
+
+        return {
+            'lookup_map': dict(
+                (get_model(label), dict(
+                    (field, dict((get_model(dep), entry) for dep, entry in deps.items()))
+                    for field, deps in fielddata.items()))
+                for label, fielddata in data['lookup_map'].items()),
+            'fk_map': dict((get_model(label), fks) for label, fks in data['fk_map'].items()),
+            'local_mro': dict((get_model(label), mro) for label, mro in data['local_mro'].items()),
+            'm2m': dict((get_model(label), names) for label, names in data['m2m'].items()),
+            'related': dict((get_model(label), fields) for label, fields in data['related'].items()),
+            'model_rank': dict((get_model(label), rank) for label, rank in data['model_rank'].items()),
+            'hash': data['hash']
+        }
+
+    def _write_map(self, path=None):
+        """
+        Write compiled resolver maps to `path` (defaults to ``_map_path``).
         Called by the management command ``createmap``.
 
-        Always does a full graph reduction.
-        Adds computed models hash to pickled data.
+        Always does a full graph reduction. The maps are stored with
+        model labels as keys in `marshal` format together with the map format version
+        and the computed models hash. The file is replaced atomically, thus concurrent
+        readers either see the old or the new map file.
+
+        Returns the graph and the maps of the graph reduction.
+        """
+        path = path or self._map_path()
+        graph, maps = self._graph_reduction()
+        label = lambda model: model._meta.label
+        data = {
+            'version': MAP_VERSION,
+            'hash': self._calc_modelhash(),
+            'lookup_map': dict(
+                (label(model), dict(
+                    (field, dict((label(dep), (set(fields), set(paths))) for dep, (fields, paths) in deps.items()))
+                    for field, deps in fielddata.items()))
+                for model, fielddata in maps['lookup_map'].items()),
+            'fk_map': dict((label(model), set(fks)) for model, fks in maps['fk_map'].items()),
+            'local_mro': dict((label(model), mro) for model, mro in maps['local_mro'].items()),
+            'm2m': dict((label(model), names) for model, names in maps['m2m'].items()),
+            'related': dict((label(model), fields) for model, fields in maps['related'].items()),
+            'model_rank': dict((label(model), rank) for model, rank in maps['model_rank'].items())
+        }
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(dir=dirname, prefix='.computedfields-')
+        try:
+            with os.fdopen(fd, 'wb') as mapfile:
+                marshal.dump(data, mapfile)
+            # mkstemp creates the file as 0600, apply the usual file mode instead,
+            # as processes of other users might have to read the map
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmppath, 0o666 & ~umask)
+            os.replace(tmppath, path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+        return graph, maps
+
+    @contextmanager
+    def _map_lock(self, path):
+        """
+        Exclusive file lock on ``<path>.lock`` for the map recreation across processes.
+        Without `fcntl` support only the atomic file replacement protects the map file.
+        """
+        if fcntl is None:  # pragma: no cover
+            yield
+            return
+        with open(path + '.lock', 'a') as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def _regenerate_map(self, path):
         """
-        _, maps = self._graph_reduction()
-        maps['hash'] = self._calc_modelhash()
-        with open(settings.COMPUTEDFIELDS_MAP, 'wb') as mapfile:
-            pickle.dump(maps, mapfile, pickle.HIGHEST_PROTOCOL)
+        Recreate a missing or outdated map file at `path`.
+
+        The recreation runs under an exclusive file lock. Processes waiting for the lock
+        load the map file written by the first process instead of doing their own
+        graph reduction. Returns ``(graph, maps)``, where `graph` is ``None``
+        for a loaded map file, or ``(None, None)`` if the map file cannot be written.
+        """
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._map_lock(path):
+                maps = self._load_map(path)
+                if maps:
+                    logger.info('COMPUTEDFIELDS_MAP loaded after recreation by another process.')
+                    return None, maps
+                logger.warning('COMPUTEDFIELDS_MAP is outdated, recreating the map file.')
+                return self._write_map(path)
+        except OSError as err:
+            logger.warning('COMPUTEDFIELDS_MAP cannot be recreated (%s), doing a full bootstrap.', err)
+            return None, None
 
     def get_local_mro(self, model, update_fields=None):
         """
@@ -324,62 +504,289 @@ class Resolver:
 
         Returns computed fields as self dependent to simplify local field dependency calculation.
         """
-        # TODO: investigate - memoization of update_fields result? (runs ~4 times faster)
+        return list(self._local_mro_for(model, update_fields))
+
+    def _local_mro_for(self, model, update_fields=None):
+        """
+        Memoized variant of ``get_local_mro``, returns the `MRO` as tuple.
+
+        The tuples are cached per model by the OR'ed bitmask of `update_fields`
+        (cache hits and misses are counted in ``stats``).
+        """
         entry = self._local_mro.get(model)
         if not entry:
-            return []
+            return ()
+        cache = self._mro_cache.get(model)
+        if cache is None:
+            # full mro fast path under key -1 (all bits set)
+            cache = self._mro_cache[model] = {-1: tuple(entry['base'])}
         if update_fields is None:
-            return entry['base']
-        update_fields = frozenset(update_fields)
-        base = entry['base']
+            return cache[-1]
         fields = entry['fields']
         mro = 0
         for field in update_fields:
             mro |= fields.get(field, 0)
-        return [name for pos, name in enumerate(base) if mro & (1 << pos)]
+        try:
+            result = cache[mro]
+            self._stats_add('mro_hits')
+        except KeyError:
+            base = entry['base']
+            result = cache[mro] = tuple(name for pos, name in enumerate(base) if mro & (1 << pos))
+            self._stats_add('mro_misses')
+        return result
+
+    def _init_plans(self, precompile=True):
+        """
+        Reset the plan cache and precompile the full update plans of all models.
+        With `precompile` set to ``False`` the plans are compiled on first usage.
+        """
+        self._plan = lru_cache(maxsize=self._plancache)(self._compile_plan)
+        if precompile:
+            for model in set(self._map) | set(self._local_mro):
+                self._plan(model, None)
 
-    def _querysets_for_update(self, model, instance, update_fields=None, pk_list=False):
+    def get_plan(self, model, update_fields=None):
         """
-        Returns a mapping of all dependent models, dependent fields and a
-        queryset containing all dependent objects.
+        Return the precompiled ``UpdatePlan`` of `model` for `update_fields`.
+
+        Plans are compiled once per distinct `update_fields` and kept in a LRU cache
+        of ``COMPUTEDFIELDS_PLANCACHE`` entries (default 512).
         """
-        final = OrderedDict()
-        modeldata = self._map.get(model)
-        if not modeldata:
-            return final
+        return self._plan(model, None if update_fields is None else frozenset(update_fields))
+
+    def _compile_plan(self, model, update_fields):
+        """
+        Compile the ``UpdatePlan`` of `model` for `update_fields` from the resolver maps.
+        """
+        # dependent models with aggregated fields and paths
+        # to cover multiple comp field dependencies
+        modeldata = self._map.get(model, {})
         if not update_fields:
-            updates = set(modeldata.keys())
+            updates = list(modeldata)
         else:
-            updates = set()
-            for fieldname in update_fields:
-                if fieldname in modeldata:
-                    updates.add(fieldname)
-        subquery = '__in' if isinstance(instance, QuerySet) else ''
+            updates = [fieldname for fieldname in modeldata if fieldname in update_fields]
         model_updates = OrderedDict()
         for update in updates:
-            # first aggregate fields and paths to cover
-            # multiple comp field dependencies
-            for model, resolver in modeldata[update].items():
+            for dep_model, resolver in modeldata[update].items():
                 fields, paths = resolver
-                m_fields, m_paths = model_updates.setdefault(model, [set(), set()])
+                m_fields, m_paths = model_updates.setdefault(dep_model, [set(), set()])
                 m_fields.update(fields)
                 m_paths.update(paths)
-        for model, data in model_updates.items():
-            fields, paths = data
-            queryset = model.objects.none()
-            for path in paths:
-                queryset |= model.objects.filter(**{path+subquery: instance})
+        dependents = tuple((dep_model, frozenset(fields), tuple(sorted(paths)))
+                           for dep_model, (fields, paths) in model_updates.items())
+
+        # local mro with query optimizations
+        # explicit optimizations come first, as derived plain lookups cannot
+        # override a Prefetch object of the same path, but are skipped behind one
+        mro = self._local_mro_for(model, update_fields)
+        select = set()
+        prefetch = []
+        derived = []
+        for field in mro:
+            computed = self._computed_models[model][field]._computed
+            if computed['select_related'] is not None or computed['prefetch_related'] is not None:
+                select.update(computed['select_related'] or [])
+                prefetch.extend(computed['prefetch_related'] or [])
+            elif computed['auto_related'] and not computed['expression'] and not computed['batch']:
+                related_select, related_prefetch = self._related.get(model, {}).get(field, ([], []))
+                select.update(related_select)
+                if computed['auto_prefetch']:
+                    derived.extend(lookup for lookup in related_prefetch if lookup not in derived)
+        prefetch.extend(derived)
+        runs = tuple((is_expression, tuple(run)) for is_expression, run in self._mro_runs(model, mro))
+        return UpdatePlan(mro, runs, frozenset(select), tuple(prefetch), dependents)
+
+    def _querysets_for_update(self, model, instance, update_fields=None, pk_list=False):
+        """
+        Returns a mapping of all dependent models, dependent fields and a
+        queryset containing all dependent objects.
+        """
+        final = OrderedDict()
+        if model not in self._map:
+            return final
+        subquery = '__in' if isinstance(instance, QuerySet) else ''
+        for model, fields, paths in self.get_plan(model, update_fields or None).dependents:
+            fields = set(fields)
+            # one pk select per path, combined by UNION
+            # (avoids expensive OR'ed multi-join queries for several relation paths,
+            # the database deduplicates the pks for us)
+            # Meta.ordering is cleared, as ORDER BY is not allowed in compound statement parts
+            pk_queries = [model.objects.filter(**{path+subquery: instance}).order_by().values_list('pk', flat=True)
+                          for path in paths]
+            pks = pk_queries[0].union(*pk_queries[1:]) if len(pk_queries) > 1 else pk_queries[0]
             if pk_list:
                 # need pks for post_delete since the real queryset will be empty
                 # after deleting the instance in question
                 # since we need to interact with the db anyways
                 # we can already drop empty results here
-                queryset = set(queryset.distinct().values_list('pk', flat=True))
+                queryset = set(pks)
                 if not queryset:
                     continue
+            elif len(pk_queries) > 1:
+                queryset = model.objects.filter(pk__in=pks)
+            else:
+                queryset = model.objects.filter(**{paths[0]+subquery: instance})
             final[model] = [queryset, fields]
         return final
 
+    def _pks_for_update(self, model, pks, update_fields=None):
+        """
+        Returns a pk map ``{model: [pks, fields]}`` of the dependent records
+        of `model` records with `pks`.
+
+        Other than ``_querysets_for_update`` the relation paths are filtered by the pks
+        directly, which saves the join of the source table. `pks` can also be a pk queryset,
+        e.g. a ``values_list`` on a m2m through table. Huge pk collections get resolved
+        in chunks of ``COMPUTEDFIELDS_QUERYSIZE``, further limited by the max. number
+        of query parameters of the database.
+        """
+        final = {}
+        if model not in self._map:
+            return final
+        if not isinstance(pks, QuerySet):
+            pks = list(pks)
+            if not pks:
+                return final
+        for dependent, fields, paths in self.get_plan(model, update_fields or None).dependents:
+            chunks = [pks] if isinstance(pks, QuerySet) else self._pk_chunks(dependent, pks, len(paths))
+            result = set()
+            for chunk in chunks:
+                # Meta.ordering is cleared, as ORDER BY is not allowed in compound statement parts
+                pk_queries = [dependent.objects.filter(**{path+'__in': chunk}).order_by().values_list('pk', flat=True)
+                              for path in paths]
+                result.update(pk_queries[0].union(*pk_queries[1:]) if len(pk_queries) > 1 else pk_queries[0])
+            if result:
+                final[dependent] = [result, set(fields)]
+        return final
+
+    def _pk_chunks(self, model, pks, params=1):
+        """
+        Split `pks` into chunks of ``COMPUTEDFIELDS_QUERYSIZE`` for ``pk__in`` filters on `model`,
+        further limited by the max. number of query parameters of the database
+        for queries with `params` filters of the chunk.
+        """
+        pks = list(pks)
+        size = self._querysize
+        max_params = connections[model.objects.db].features.max_query_params
+        if max_params:
+            size = max(1, min(size, max_params // params))
+        return [pks[i:i+size] for i in range(0, len(pks), size)]
+
+    def _get_fk_attnames(self, model):
+        """
+        Returns a mapping of contributing fk field names of `model` to their attnames.
+        """
+        try:
+            return self._fk_attnames[model]
+        except KeyError:
+            attnames = self._fk_attnames[model] = dict(
+                (name, model._meta.get_field(name).attname) for name in self._fk_map.get(model, ()))
+            return attnames
+
+    def _snapshot_fks(self, instance, model):
+        """
+        Store the current values of contributing fk fields on `instance`
+        (``COMPUTEDFIELDS_TRACK_CHANGES``).
+
+        Called for instances of models with contributing fks after init (this covers
+        ``from_db``), after saves and after ``refresh_from_db``.
+        Deferred fields are not part of the snapshot.
+        """
+        values = instance.__dict__
+        instance._computedfields_fks = dict(
+            (attname, values[attname]) for attname in self._get_fk_attnames(model).values()
+            if attname in values)
+
+    def _changed_fks(self, instance, model, fieldnames):
+        """
+        Returns the contributing fk fields in `fieldnames`, whose values differ
+        from the snapshot of `instance`. Without a snapshot all fields are returned.
+        """
+        snapshot = instance.__dict__.get('_computedfields_fks')
+        if snapshot is None:
+            return fieldnames
+        values = instance.__dict__
+        attnames = self._get_fk_attnames(model)
+        changed = set()
+        for name in fieldnames:
+            attname = attnames[name]
+            # fields not in values were neither loaded nor set
+            if attname in values and (attname not in snapshot or values[attname] != snapshot[attname]):
+                changed.add(name)
+        return changed
+
+    def _refresh_snapshots(self, instance, model, fields=None):
+        """
+        Update the snapshots of `instance` for `fields` reloaded by ``refresh_from_db``,
+        ``None`` refreshes all loaded fields. `fields` may contain field names or attnames,
+        as Django loads deferred fields by their attname.
+        """
+        values = instance.__dict__
+        if fields is None:
+            if '_computedfields_fks' in values:
+                self._snapshot_fks(instance, model)
+            if '_computedfields_snapshot' in values:
+                self._snapshot_fields(instance, model)
+            return
+        fields = set(fields)
+        for key, attnames in (('_computedfields_fks', self._get_fk_attnames(model)),
+                              ('_computedfields_snapshot', self._get_tracked_attnames(model))):
+            snapshot = values.get(key)
+            if snapshot is None:
+                continue
+            for name, attname in attnames.items():
+                if (name in fields or attname in fields) and attname in values:
+                    snapshot[attname] = values[attname]
+
+    def _get_tracked_attnames(self, model):
+        """
+        Returns a mapping of field names to attnames of concrete fields of `model`,
+        that are used by local computed fields, by the lookup map or as contributing fks.
+        """
+        try:
+            return self._tracked_attnames[model]
+        except KeyError:
+            names = set(self._map.get(model, {})) | set(self._local_mro.get(model, {}).get('fields', {}))
+            names.update(self._fk_map.get(model, ()))
+            names.discard('#')
+            attnames = {}
+            for name in names:
+                field = model._meta.get_field(name)
+                if field.concrete:
+                    attnames[name] = field.attname
+            self._tracked_attnames[model] = attnames
+            return attnames
+
+    def _snapshot_fields(self, instance, model, update_fields=None):
+        """
+        Store the current values of tracked fields on `instance` (``COMPUTEDFIELDS_TRACK_CHANGES``).
+        Deferred fields are not part of the snapshot. With `update_fields` only those fields
+        get refreshed in an existing snapshot.
+        """
+        values = instance.__dict__
+        attnames = self._get_tracked_attnames(model)
+        snapshot = values.get('_computedfields_snapshot')
+        if update_fields is None or snapshot is None:
+            snapshot = instance._computedfields_snapshot = {}
+        else:
+            attnames = dict((name, attnames[name]) for name in update_fields if name in attnames)
+        for attname in attnames.values():
+            if attname in values:
+                snapshot[attname] = values[attname]
+
+    def _changed_fields(self, instance, model):
+        """
+        Returns the tracked fields of `instance`, whose values differ from the snapshot,
+        or ``None`` if `instance` has no snapshot.
+        """
+        snapshot = instance.__dict__.get('_computedfields_snapshot')
+        if snapshot is None:
+            return None
+        values = instance.__dict__
+        return set(
+            name for name, attname in self._get_tracked_attnames(model).items()
+            if attname in values and (attname not in snapshot or values[attname] != snapshot[attname]))
+
     def preupdate_dependent(self, instance, model=None, update_fields=None):
         """
         Create a mapping of currently associated computed field records,
@@ -469,6 +876,11 @@ class Resolver:
 
         `update_local` disables model local computed field updates of the entry node
         (used as optimization during tree traversal). You should not set it when called from outside.
+
+        If the consistency level of `model` is set to ``'async'`` or ``'eventual'`` in
+        ``COMPUTEDFIELDS_CONSISTENCY``, only the local computed fields are updated directly,
+        the dependent records are handed off to the executor or the queue table
+        (see :mod:`computedfields.executors`).
         """
         if not model:
             if isinstance(instance, QuerySet):
@@ -489,17 +901,23 @@ class Resolver:
                 update_fields = set(update_fields)
             self.bulk_updater(queryset, update_fields, local_only=True)
 
-        updates = self._querysets_for_update(model, instance, update_fields).values()
-        if updates:
-            with transaction.atomic():
-                pks_updated = {}
-                for queryset, fields in updates:
-                    pks_updated[queryset.model] = self.bulk_updater(queryset, fields, True)
-                if old:
-                    for model, data in old.items():
-                        pks, fields = data
-                        queryset = model.objects.filter(pk__in=pks-pks_updated[model])
-                        self.bulk_updater(queryset, fields)
+        updates = self._querysets_for_update(model, instance, update_fields, pk_list=True)
+        if old:
+            self._merge_pending(updates, old)
+
+        self._cascade_or_dispatch([model], updates)
+
+    def _cascade_or_dispatch(self, models, updates):
+        """
+        Update the dependent records in pk map `updates` of changes on `models`.
+        If all `models` have a weaker consistency, the updates get handed off
+        by the strongest level among them.
+        """
+        level = executors.get_strongest_consistency(models)
+        if level != 'sync' and not executors.in_worker():
+            executors.dispatch(level, updates)
+            return
+        self._update_cascade(updates)
 
     def update_dependent_multi(self, instances, old=None, update_local=True):
         """
@@ -539,29 +957,20 @@ class Resolver:
         back as `old` argument to this function.
         """
         final = {}
+        models = set()
         for instance in instances:
             model = instance.model if isinstance(instance, QuerySet) else type(instance)
+            models.add(model)
 
             if update_local and self.has_computedfields(model):
                 queryset = instance if isinstance(instance, QuerySet) \
                     else model.objects.filter(pk__in=[instance.pk])
                 self.bulk_updater(queryset, None, local_only=True)
 
-            updates = self._querysets_for_update(model, instance, None)
-            for model, data in updates.items():
-                query_field = final.setdefault(model, [model.objects.none(), set()])
-                query_field[0] |= data[0]       # or'ed querysets
-                query_field[1].update(data[1])  # add fields
-        if final:
-            with transaction.atomic():
-                pks_updated = {}
-                for queryset, fields in final.values():
-                    pks_updated[queryset.model] = self.bulk_updater(queryset, fields, True)
-                if old:
-                    for model, data in old.items():
-                        pks, fields = data
-                        queryset = model.objects.filter(pk__in=pks-pks_updated[model])
-                        self.bulk_updater(queryset, fields)
+            self._merge_pending(final, self._querysets_for_update(model, instance, None, pk_list=True))
+        if old:
+            self._merge_pending(final, old)
+        self._cascade_or_dispatch(models, final)
 
     def bulk_updater(self, queryset, update_fields, return_pks=False, local_only=False):
         """
@@ -578,54 +987,394 @@ class Resolver:
 
         By default this method triggers the update of dependent models by calling
         ``update_dependent`` with `update_fields` (next level of tree traversal).
+        The next level is only entered from records with altered computed field values,
+        unless the update contains expression fields or fields marked with `always_propagate`.
         This can be suppressed by setting `local_only=True`.
 
         If `return_pks` is set, the method returns a set of altered pks of `queryset`.
+
+        The records are pulled in pk ordered chunks of ``COMPUTEDFIELDS_QUERYSIZE``
+        (default 10000), thus at most one chunk of model instances is held in memory.
+        """
+        pks, descend, fields = self._update_records(queryset, update_fields, return_pks, not local_only)
+        if descend is not None:
+            self._update_cascade(self._next_level(queryset.model, descend, fields))
+        return pks
+
+    async def apreupdate_dependent(self, instance, model=None, update_fields=None):
+        """
+        Async version of ``preupdate_dependent``.
+        """
+        return await self._arun(self.preupdate_dependent, instance, model, update_fields)
+
+    async def apreupdate_dependent_multi(self, instances):
+        """
+        Async version of ``preupdate_dependent_multi``.
+        """
+        return await self._arun(self.preupdate_dependent_multi, instances)
+
+    async def aupdate_dependent(self, instance, model=None, update_fields=None,
+                                old=None, update_local=True):
+        """
+        Async version of ``update_dependent`` to be used from async views or tasks:
+
+            >>> qs = Entry.objects.filter(pub_date__year=2010)
+            >>> await sync_to_async(qs.update)(comments_on=False)
+            >>> await aupdate_dependent(qs)
+
+        The update runs as one sync call by asgiref's ``sync_to_async``, thus the update cascade is applied in a single
+        transaction as with ``update_dependent``.
+        """
+        return await self._arun(self.update_dependent, instance, model, update_fields, old, update_local)
+
+    async def aupdate_dependent_multi(self, instances, old=None, update_local=True):
+        """
+        Async version of ``update_dependent_multi``, see ``aupdate_dependent``.
+        """
+        return await self._arun(self.update_dependent_multi, instances, old, update_local)
+
+    async def abulk_updater(self, queryset, update_fields, return_pks=False, local_only=False):
+        """
+        Async version of ``bulk_updater``, see ``aupdate_dependent``.
+        """
+        return await self._arun(self.bulk_updater, queryset, update_fields, return_pks, local_only)
+
+    async def _arun(self, func, *args):
+        """
+        Run the sync `func` with `args` from async code.
+        """
+        if sync_to_async is None:  # pragma: no cover
+            raise ResolverException('async updates need asgiref')
+        return await sync_to_async(func, thread_sensitive=True)(*args)
+
+    def _update_records(self, queryset, update_fields, return_pks, with_descent):
+        """
+        Local part of ``bulk_updater``, updates the computed fields of `queryset`.
+
+        Returns a tuple of ``(pks, descend, fields)``, where `pks` contains
+        the processed pks (only with `return_pks`), `descend` a queryset of records
+        to enter the next tree level from (``None`` if nothing changed or `with_descent`
+        is not set) and `fields` the updated computed fields.
         """
         queryset = queryset.distinct()
         model = queryset.model
 
         # correct update_fields by local mro
-        mro = self.get_local_mro(queryset.model, update_fields)
-        fields = set(mro)
+        plan = self.get_plan(model, update_fields)
+        fields = set(plan.mro)
         if update_fields:
             update_fields.update(fields)
 
-        # TODO: precalc and check prefetch/select related entries during map creation somehow?
-        select = set()
-        prefetch = []
-        for field in fields:
-            select.update(self._computed_models[model][field]._computed['select_related'] or [])
-            prefetch.extend(self._computed_models[model][field]._computed['prefetch_related'] or [])
-        if select:
-            queryset = queryset.select_related(*select)
-        if prefetch:
-            queryset = queryset.prefetch_related(*prefetch)
+        if plan.select_related:
+            queryset = queryset.select_related(*plan.select_related)
+        if plan.prefetch_related:
+            queryset = queryset.prefetch_related(*plan.prefetch_related)
 
         # do bulk_update on computed fields in question
         # set COMPUTEDFIELDS_BATCHSIZE in settings.py to adjust batchsize (default 100)
+        # expression fields are done as UPDATE statements in between in mro order
+        # records are walked in chunks of COMPUTEDFIELDS_QUERYSIZE to bound memory usage
+        pks = set() if return_pks else None
+        has_records = None
+        # pks of records with altered computed field values, None marks all records
+        changed = set()
+        if any(self._computed_models[model][f]._computed['always_propagate'] for f in fields):
+            changed = None
         if fields:
-            change = []
-            for elem in queryset:
-                has_changed = False
-                for comp_field in mro:
-                    new_value = self._compute(elem, model, comp_field)
-                    if new_value != getattr(elem, comp_field):
-                        has_changed = True
-                        setattr(elem, comp_field, new_value)
-                if has_changed:
-                    change.append(elem)
-                if len(change) >= self._batchsize:
-                    model.objects.bulk_update(change, fields)
-                    change = []
-            if change:
-                model.objects.bulk_update(change, fields)
-
-        # trigger dependent comp field updates on all records
-        # skip recursive call if queryset is empty
-        if not local_only and queryset:
-            self.update_dependent(queryset, model, fields, update_local=False)
-        return set(el.pk for el in queryset) if return_pks else None
+            for is_expression, run in plan.runs:
+                if is_expression:
+                    # the UPDATE statement does not tell which values changed
+                    self._expression_updater(queryset, model, run)
+                    changed = None
+                    continue
+                has_records = False
+                # records are pulled from the database per run,
+                # thus method runs see the values written by previous expression runs
+                for chunk in self._iter_chunks(queryset):
+                    has_records = True
+                    # fields in mro order over the whole chunk, which allows
+                    # batch methods to calculate the values of a chunk at once
+                    change = {}
+                    for comp_field in run:
+                        values = self._compute_chunk(chunk, model, comp_field)
+                        for elem, new_value in zip(chunk, values):
+                            if new_value != getattr(elem, comp_field):
+                                setattr(elem, comp_field, new_value)
+                                change[id(elem)] = elem
+                    if change:
+                        change = list(change.values())
+                        if changed is not None:
+                            changed.update(elem.pk for elem in change)
+                        for i in range(0, len(change), self._batchsize):
+                            model.objects.bulk_update(change[i:i+self._batchsize], run)
+                    change = None
+                    if pks is not None:
+                        pks.update(elem.pk for elem in chunk)
+                    self._stats_memory()
+
+        # pks not yet collected by a method run
+        if has_records is None and (return_pks or with_descent):
+            all_pks = set(queryset.values_list('pk', flat=True))
+            has_records = bool(all_pks)
+            if return_pks:
+                pks = all_pks
+
+        # descend from changed records only
+        # skip next level if nothing changed
+        descend = None
+        if with_descent and has_records:
+            if not fields or changed is None:
+                descend = queryset
+            elif changed:
+                descend = model.objects.filter(pk__in=changed)
+        return pks, descend, fields
+
+    def _next_level(self, model, queryset, fields):
+        """
+        Returns the pk map of dependent records for the next tree level of `queryset`.
+        For models with weaker consistency the next level gets handed off
+        and an empty map is returned.
+        """
+        updates = self._querysets_for_update(model, queryset, fields, pk_list=True)
+        level = executors.get_consistency(model)
+        if updates and level != 'sync' and not executors.in_worker():
+            executors.dispatch(level, updates)
+            return {}
+        return updates
+
+    def _merge_pending(self, pending, updates):
+        """
+        Merge pk map `updates` into `pending`.
+        Merges into an already pending model are counted as `avoided_passes`.
+        """
+        for model, (pks, fields) in updates.items():
+            entry = pending.get(model)
+            if entry is None:
+                pending[model] = [set(pks), None if fields is None else set(fields)]
+                continue
+            self._stats_add('avoided_passes')
+            entry[0].update(pks)
+            if entry[1] is not None:
+                if fields is None:
+                    entry[1] = None
+                else:
+                    entry[1].update(fields)
+        return pending
+
+    def _update_cascade(self, pending):
+        """
+        Update dependent records in pk map `pending` ``{model: [pks, fields]}``
+        and all further levels of the dependency tree.
+
+        Instead of walking the tree depth first per relation, the cascade is scheduled
+        by the topological order of the model dependencies. The next levels of an updated
+        model are merged into the pending records, thus a model reachable by several
+        paths (diamond shaped dependencies) gets updated only once for all its dirty records,
+        as long as the model dependencies are free of cycles.
+
+        With ``COMPUTEDFIELDS_PARALLEL`` set, independent models of the cascade (models without
+        a dependency path between them) are updated concurrently on a thread pool.
+        This is only done outside of atomic blocks, as the threads use their own database
+        connections and transactions.
+        """
+        if not pending:
+            return
+        pending = self._merge_pending({}, pending)
+        if self._parallel and not transaction.get_connection().in_atomic_block:
+            self._run_cascade(pending, True)
+        else:
+            with transaction.atomic():
+                self._run_cascade(pending, False)
+
+    def _run_cascade(self, pending, parallel):
+        rank = self._model_rank
+        while pending:
+            ready = self._independent_models(pending) if parallel else []
+            if len(ready) > 1:
+                # run independent branches concurrently, join before the next level
+                branches = [(model, self._get_pool().submit(self._update_branch, model, *pending.pop(model)))
+                            for model in ready]
+                wait([future for _, future in branches])
+                results = [(model, future.result()) for model, future in branches]
+                self._stats_add('parallel_branches', len(branches))
+            else:
+                model = min(pending, key=lambda model: rank.get(model, 0))
+                results = [(model, self._update_chunks(model, *pending.pop(model)))]
+            for model, chunks in results:
+                for descend, fields in chunks:
+                    if descend is not None:
+                        self._merge_pending(pending, self._next_level(model, descend, fields))
+
+    def _update_chunks(self, model, pks, fields):
+        """
+        Update records of `model` with `pks` in chunks of ``COMPUTEDFIELDS_QUERYSIZE``,
+        which bounds the ``pk__in`` filters for huge pk sets.
+        Returns a list of ``(descend, fields)`` per chunk as ``_update_records``.
+        """
+        return [self._update_records(model.objects.filter(pk__in=chunk), fields, False, True)[1:]
+                for chunk in self._pk_chunks(model, pks)]
+
+    def _update_branch(self, model, pks, fields):
+        """
+        Thread pool entry of parallel cascades, updates records of `model` in a separate
+        transaction. Returns ``(descend, fields)`` per chunk as ``_update_chunks``.
+        """
+        try:
+            with transaction.atomic():
+                return self._update_chunks(model, pks, fields)
+        finally:
+            # threads open their own connections
+            connections.close_all()
+
+    def _get_pool(self):
+        with self._lock:
+            if not self._pool:
+                self._pool = ThreadPoolExecutor(max_workers=self._parallel)
+            return self._pool
+
+    def _independent_models(self, pending):
+        """
+        Returns pending models, that are not reachable from any other pending model.
+        """
+        return sorted((model for model in pending
+                       if not any(model in self._get_reach(other) for other in pending if other is not model)),
+                      key=lambda model: self._model_rank.get(model, 0))
+
+    def _get_reach(self, model):
+        """
+        Returns the models reachable from `model` in the lookup map
+        (contains the model itself for cycles). Calculated lazily per model.
+        """
+        try:
+            return self._model_reach[model]
+        except KeyError:
+            seen = set()
+            todo = [model]
+            while todo:
+                for data in self._map.get(todo.pop(), {}).values():
+                    for dep in data:
+                        if dep not in seen:
+                            seen.add(dep)
+                            todo.append(dep)
+            self._model_reach[model] = seen
+            return seen
+
+    @staticmethod
+    def _rank_models(lookup_map):
+        """
+        Rank models in topological order of their dependencies in `lookup_map`.
+        Models in a dependency cycle share the same rank.
+        """
+        successors = {}
+        for model, fielddata in lookup_map.items():
+            deps = successors.setdefault(model, set())
+            for data in fielddata.values():
+                deps.update(data)
+            for dep in deps:
+                successors.setdefault(dep, set())
+        # tarjan returns components in reverse topological order
+        components = strongly_connected(successors, set(successors))
+        return dict((model, rank) for rank, component in enumerate(reversed(components))
+                    for model in component)
+
+    def _init_model_order(self, rank):
+        """
+        Set the model ranks and reset the reachability cache.
+        """
+        self._model_rank = rank
+        self._model_reach = {}
+
+    def _iter_chunks(self, queryset):
+        """
+        Walk `queryset` in pk ordered chunks of ``COMPUTEDFIELDS_QUERYSIZE`` records.
+
+        The chunks are selected by pk ranges, thus `select_related` and `prefetch_related`
+        of `queryset` are applied per chunk, and records changed by previous chunks cannot shift
+        the next chunk. Sliced querysets are returned as one chunk.
+        """
+        if not queryset.query.can_filter():
+            # fresh clone, a result cache would hide values of previous expression runs
+            chunk = list(queryset.all())
+            self._stats_max('peak_instances', len(chunk))
+            yield chunk
+            return
+        queryset = queryset.order_by('pk')
+        chunk = list(queryset[:self._querysize])
+        while chunk:
+            self._stats_max('peak_instances', len(chunk))
+            yield chunk
+            if len(chunk) < self._querysize:
+                return
+            last = chunk[-1].pk
+            chunk = None  # release instances before pulling the next chunk
+            chunk = list(queryset.filter(pk__gt=last)[:self._querysize])
+
+    def _mro_runs(self, model, mro):
+        """
+        Split `mro` into consecutive runs of method and expression fields.
+
+        Returns a list of ``(is_expression, fieldnames)`` tuples. Method runs are calculated
+        on model instances, expression runs are written by UPDATE statements. An expression run
+        is split further, if an expression field depends on a previous field of the same run,
+        since an UPDATE statement would only see the old values.
+        """
+        runs = []
+        entry = self._local_mro.get(model, {})
+        bitmasks = entry.get('fields', {})
+        base = entry.get('base', [])
+        dependent = 0
+        for fieldname in mro:
+            is_expression = self._computed_models[model][fieldname]._computed['expression'] is not None
+            pos = 1 << base.index(fieldname)
+            if not runs or runs[-1][0] != is_expression or (is_expression and dependent & pos):
+                runs.append((is_expression, []))
+                dependent = 0
+            runs[-1][1].append(fieldname)
+            dependent |= bitmasks.get(fieldname, 0)
+        return runs
+
+    def _expression_updater(self, queryset, model, fieldnames):
+        """
+        Write expression fields in `fieldnames` for all records of `queryset`
+        with a single UPDATE statement.
+        """
+        values = {}
+        for fieldname in fieldnames:
+            expression = self._computed_models[model][fieldname]._computed['expression']
+            values[fieldname] = expression() if callable(expression) else expression
+        if connections[queryset.db].features.update_can_self_select:
+            pks = queryset.values('pk')
+        else:
+            # some databases (e.g. MySQL) cannot select from the table to be updated
+            pks = list(queryset.values_list('pk', flat=True))
+        model.objects.filter(pk__in=pks).update(**values)
+
+    def reset_stats(self):
+        """
+        Reset the runtime statistics in ``stats``.
+
+        Currently tracked values:
+
+            - `peak_instances`: max. number of model instances held by ``bulk_updater`` at once
+            - `peak_memory`: peak memory in bytes as reported by :mod:`tracemalloc` during
+              ``bulk_updater`` (only tracked, if :mod:`tracemalloc` is tracing)
+            - `mro_hits`, `mro_misses`: cache hits and misses of the local `MRO` cache
+            - `avoided_passes`: dependent model updates merged into an already scheduled
+              update of the same model during a cascade
+            - `parallel_branches`: model updates run concurrently (``COMPUTEDFIELDS_PARALLEL``)
+        """
+        self.stats = {}
+
+    def _stats_max(self, key, value):
+        if value > self.stats.get(key, 0):
+            self.stats[key] = value
+
+    def _stats_add(self, key, value=1):
+        self.stats[key] = self.stats.get(key, 0) + value
+
+    def _stats_memory(self):
+        if tracemalloc.is_tracing():
+            self._stats_max('peak_memory', tracemalloc.get_traced_memory()[1])
 
     def _compute(self, instance, model, fieldname):
         """
@@ -637,8 +1386,28 @@ class Resolver:
         to the database, always use ``compute(fieldname)`` instead.
         """
         field = self._computed_models[model][fieldname]
+        if field._computed['batch']:
+            return self._compute_batch([instance], model, fieldname)[0]
         return field._computed['func'](instance)
 
+    def _compute_chunk(self, instances, model, fieldname):
+        """
+        Returns the computed field values for ``fieldname`` of all `instances`
+        as list in the same order. Batch methods get called once for all instances.
+        Same MRO restrictions apply as for ``_compute``.
+        """
+        if not self._computed_models[model][fieldname]._computed['batch']:
+            return [self._compute(instance, model, fieldname) for instance in instances]
+        return self._compute_batch(instances, model, fieldname)
+
+    def _compute_batch(self, instances, model, fieldname):
+        values = list(self._computed_models[model][fieldname]._computed['func'](instances))
+        if len(values) != len(instances):
+            raise ResolverException(
+                'batch method of {}.{} returned {} values for {} instances'.format(
+                    modelname(model), fieldname, len(values), len(instances)))
+        return values
+
     def compute(self, instance, fieldname):
         """
         Returns the computed field value for ``fieldname``. This method allows
@@ -654,7 +1423,7 @@ class Resolver:
         # - calc all local cfs, that the requested one depends on
         # - stack and rewind interim values, as we dont want to introduce side effects here
         #   (in fact the save/bulker logic might try to save db calls based on changes)
-        mro = self.get_local_mro(type(instance), None)
+        mro = self._local_mro_for(type(instance), None)
         if not fieldname in mro:
             return getattr(instance, fieldname)
         entries = self._local_mro[type(instance)]['fields']
@@ -692,7 +1461,9 @@ class Resolver:
             raise ResolverException('resolver has no maps loaded yet')
         return self._fk_map
 
-    def computed(self, field, depends=None, select_related=None, prefetch_related=None):
+    def computed(self, field, depends=None, select_related=None, prefetch_related=None,
+                 expression=None, always_propagate=False, batch=False, auto_related=True,
+                 auto_prefetch=False):
         """
         Decorator to create computed fields.
 
@@ -729,7 +1500,14 @@ class Resolver:
             Dependencies to model local fields should be list with ``'self'`` as relation name.
 
         With `select_related` and `prefetch_related` you can instruct the dependency resolver
-        to apply certain optimizations on the update queryset.
+        to apply certain optimizations on the update queryset. Without them the resolver derives
+        ``select_related`` lookups from the leading fk and o2o segments of the relations in `depends`.
+        Set `auto_related` to ``False`` to disable the derived optimizations for a field.
+        With `auto_prefetch` set to ``True`` relations containing a reverse or m2m segment
+        get prefetched as well. This is not done by default, as methods running aggregates
+        or filtered queries over a relation do not use the prefetched records, where a prefetch
+        would be an extra query loading all related records without any use.
+        Expression and batch fields never get derived optimizations.
 
         .. NOTE::
 
@@ -744,6 +1522,49 @@ class Resolver:
             it is a good idea not to rely on lookups with custom attributes,
             or to test explicitly for them in the method with an appropriate plan B.
 
+        With `expression` the resolver calculates the field on the database side.
+        It should be a Django expression usable in ``QuerySet.update``, or a callable
+        returning such an expression to allow references to models defined later on.
+        Plain aggregates are not allowed in UPDATE statements, thus aggregates over relations
+        have to be written as ``Subquery`` with ``OuterRef``:
+
+        .. code-block:: python
+
+            @computed(models.IntegerField(default=0), depends=[['children', ['parent']]],
+                      expression=lambda: Coalesce(Subquery(Child.objects
+                          .filter(parent=OuterRef('pk'))
+                          .values('parent')
+                          .annotate(count=Count('pk'))
+                          .values('count')), 0))
+            def children_count(self):
+                return self.children.all().count()
+
+        During dependency updates those fields are written by a single
+        ``UPDATE ... SET field = (expression) WHERE pk IN (...)`` statement without
+        constructing model instances. The decorated method is still needed and used for
+        instance saves and ``compute``, as the instance might contain unsaved changes.
+        Both should return the same result.
+
+        With `batch` set to ``True`` the decorated function gets called with a list of instances
+        and must return a sequence of their values in the same order. During dependency updates
+        it is called once per chunk of records, which allows to replace per record queries
+        by one grouped query:
+
+        .. code-block:: python
+
+            @computed(models.IntegerField(default=0), depends=[['children', ['value']]], batch=True)
+            def children_sum(instances):
+                sums = dict(Child.objects.filter(parent__in=instances)
+                    .values_list('parent').annotate(sum=Sum('value')))
+                return [sums.get(instance.pk, 0) for instance in instances]
+
+        Instance saves and ``compute`` call the function with a single instance list.
+
+        During dependency updates the resolver only descends further into the dependency tree
+        from records, whose computed field values actually changed. If the method has side
+        effects, that are not covered by the field value (e.g. altering other records),
+        set `always_propagate` to ``True`` to descend from all records of the update.
+
         .. CAUTION::
 
             With the dependency resolver you can easily create recursive dependencies
@@ -792,7 +1613,12 @@ class Resolver:
                 'func': func,
                 'depends': depends or [],
                 'select_related': select_related,
-                'prefetch_related': prefetch_related
+                'prefetch_related': prefetch_related,
+                'expression': expression,
+                'always_propagate': always_propagate,
+                'batch': batch,
+                'auto_related': auto_related,
+                'auto_prefetch': auto_prefetch
             }
             field.editable = False
             self.add_field(field)
@@ -850,7 +1676,7 @@ class Resolver:
         model = type(instance)
         if not self.has_computedfields(model):
             return update_fields
-        cf_mro = self.get_local_mro(model, update_fields)
+        cf_mro = self._local_mro_for(model, update_fields)
         if update_fields:
             update_fields = set(update_fields)
             update_fields.update(set(cf_mro))
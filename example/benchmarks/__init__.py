@@ -0,0 +1,53 @@
+"""
+Benchmarks of the example project.
+
+Run them from the example directory:
+
+    python -m benchmarks.graph
+    python -m benchmarks.handlers
+    python -m benchmarks.m2m
+
+Benchmarks touching the database create a temporary test database.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup():
+    """
+    Configure django with the example settings.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Run the block against a freshly created test database.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(func, repeat=3):
+    """
+    Returns the best runtime of `repeat` calls of `func` in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,160 @@
+"""
+Startup benchmark of the dependency graph algorithms on generated DAGs.
+
+    python -m benchmarks.graph [--sizes 100 1000 10000]
+
+Times the transitive reduction (``remove_redundant``), the cycle check of the
+union graph (``is_cyclefree``), the cycle inspection (``get_cycles``) and the
+local field topsort (``ModelGraph.generate_local_masks``) against the path
+enumerating implementations of earlier versions, which are replicated below.
+The legacy algorithms grow exponentially (reduction) or cubic (topsort),
+thus they only run up to ``--legacy-reduction-max`` and ``--legacy-tsort-max`` nodes.
+"""
+import argparse
+import random
+import sys
+
+from . import setup, timed
+
+
+def generate_dag(size, seed=0, window=50):
+    """
+    Layered DAG with `size` nodes, every node gets 1-3 parents
+    among the `window` nodes created before.
+    """
+    rnd = random.Random(seed)
+    edges = set()
+    for right in range(1, size):
+        lower = max(0, right - window)
+        for _ in range(rnd.randint(1, 3)):
+            edges.add((rnd.randint(lower, right - 1), right))
+    return sorted(edges)
+
+
+def build_graph(edges):
+    from computedfields.graph import Graph, Edge, Node
+    graph = Graph()
+    for left, right in edges:
+        graph.add_edge(Edge(Node(left), Node(right)))
+    return graph
+
+
+def build_modelgraph(size, edges):
+    from computedfields.graph import ModelGraph
+    deps = {}
+    for left, right in edges:
+        deps.setdefault('c%d' % right, set()).add('c%d' % left)
+    return ModelGraph(None, deps, ['c%d' % pos for pos in range(size)])
+
+
+def legacy_remove_redundant(graph):
+    """
+    Path pair comparing reduction of earlier versions.
+    """
+    from computedfields.graph import Edge
+    from computedfields.helper import pairwise, is_sublist
+
+    def start_end(paths):
+        return set((path[0], path[-1]) for path in paths)
+
+    paths = graph.get_nodepaths()
+    points = start_end(paths)
+    candidates = []
+    for p_path in paths:
+        for q_path in paths:
+            if set(p_path).issuperset(q_path) and not is_sublist(q_path, p_path):
+                candidates.append(q_path)
+    removed = set()
+    for candidate in candidates:
+        for edge in [Edge(*nodes) for nodes in pairwise(candidate)]:
+            if edge in removed:
+                continue
+            graph.remove_edge(edge)
+            removed.add(edge)
+            if start_end(graph.get_nodepaths()) != points:
+                graph.add_edge(edge)
+                removed.remove(edge)
+    return removed
+
+
+def legacy_topological_paths(modelgraph):
+    """
+    Recursive topsort of earlier versions, accumulating a path list per node.
+    """
+    from computedfields.graph import Node
+
+    def tsort(graph, start, paths, path):
+        for node in graph.get(start, []):
+            if node not in paths:
+                paths[node] = tsort(graph, node, paths, [])
+            for snode in paths[node]:
+                if snode not in path:
+                    path += [snode]
+        path += [start]
+        return path
+
+    graph = modelgraph._get_graph()
+    paths = {}
+    paths[Node('##')] = tsort(graph, Node('##'), paths, [])[:-1]
+    for node in graph:
+        if node not in paths:
+            paths[node] = tsort(graph, node, paths, [])[:-1]
+    return dict((node, path[::-1]) for node, path in paths.items())
+
+
+def run(sizes, legacy_reduction_max, legacy_tsort_max, repeat):
+    def reduction():
+        build_graph(edges).remove_redundant()
+
+    def cycle_check():
+        assert graph.is_cyclefree
+
+    def cycles():
+        graph.get_cycles()
+
+    def local_masks():
+        modelgraph = build_modelgraph(size, edges)
+        modelgraph.transitive_reduction()
+        modelgraph.generate_local_masks()
+
+    def legacy_reduction():
+        legacy_remove_redundant(build_graph(edges))
+
+    def legacy_tsort():
+        modelgraph = build_modelgraph(size, edges)
+        modelgraph.transitive_reduction()
+        legacy_topological_paths(modelgraph)
+
+    columns = ['nodes', 'edges', 'reduction', 'cyclecheck', 'get_cycles', 'local_mro',
+               'legacy_reduction', 'legacy_local_mro']
+    print(''.join('%18s' % column for column in columns))
+    for size in sizes:
+        edges = generate_dag(size)
+        graph = build_graph(edges)
+        results = [
+            timed(reduction, repeat),
+            timed(cycle_check, repeat),
+            timed(cycles, repeat),
+            timed(local_masks, repeat),
+            timed(legacy_reduction, 1) if size <= legacy_reduction_max else None,
+            timed(legacy_tsort, 1) if size <= legacy_tsort_max else None,
+        ]
+        print('%18d%18d' % (size, len(edges))
+              + ''.join('%17.4fs' % value if value is not None else '%18s' % '-' for value in results))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[25, 100, 1000, 10000])
+    parser.add_argument('--legacy-reduction-max', type=int, default=25)
+    parser.add_argument('--legacy-tsort-max', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(argv)
+    setup()
+    # the legacy topsort recurses along the longest path
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * options.legacy_tsort_max))
+    run(options.sizes, options.legacy_reduction_max, options.legacy_tsort_max, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-save overhead of the signal handlers for a model unrelated to computed fields.
+
+    python -m benchmarks.handlers [--saves 5000]
+
+Compares the handlers connected per sender (current) against the handlers connected
+globally with ``sender=None`` (earlier versions), for the ``pre_save``/``post_save``
+dispatch alone and for full saves of ``auth.Group`` records within one transaction.
+"""
+import argparse
+
+from . import setup, test_database, timed
+
+
+def global_handlers():
+    """
+    Signal handler registration of earlier versions, for all senders.
+    """
+    from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
+    from computedfields.handlers import (
+        get_old_handler, postsave_handler, predelete_handler, postdelete_handler, m2m_handler)
+    return [
+        (pre_save, get_old_handler, 'BENCH_PRESAVE'),
+        (post_save, postsave_handler, 'BENCH_POSTSAVE'),
+        (pre_delete, predelete_handler, 'BENCH_PREDELETE'),
+        (post_delete, postdelete_handler, 'BENCH_POSTDELETE'),
+        (m2m_changed, m2m_handler, 'BENCH_M2M'),
+    ]
+
+
+def run(saves, repeat):
+    from django.contrib.auth.models import Group
+    from django.db import transaction
+    from django.db.models.signals import post_save, pre_save
+    from computedfields.models import active_resolver
+
+    assert Group not in active_resolver._map and Group not in active_resolver._fk_map
+    groups = [Group.objects.create(name='group%d' % pos) for pos in range(saves)]
+
+    def dispatch():
+        for group in groups:
+            pre_save.send(sender=Group, instance=group, raw=False, using='default', update_fields=None)
+            post_save.send(sender=Group, instance=group, created=False, raw=False,
+                           using='default', update_fields=None)
+
+    def save():
+        with transaction.atomic():
+            for group in groups:
+                group.save()
+
+    results = {}
+    for mode in ('per sender', 'global'):
+        connected = global_handlers() if mode == 'global' else []
+        for signal, handler, uid in connected:
+            signal.connect(handler, sender=None, weak=False, dispatch_uid=uid)
+        try:
+            results[mode] = (timed(dispatch, repeat), timed(save, repeat))
+        finally:
+            for signal, handler, uid in connected:
+                signal.disconnect(sender=None, dispatch_uid=uid)
+
+    print('%12s%20s%20s' % ('handlers', 'dispatch per save', 'save'))
+    for mode, (dispatch_time, save_time) in results.items():
+        print('%12s%18.2fus%18.2fus' % (mode, dispatch_time / saves * 1e6, save_time / saves * 1e6))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--saves', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(argv)
+    setup()
+    with test_database():
+        run(options.saves, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+m2m change benchmark on the ``Person``/``Group`` models of ``test_full``.
+
+    python -m benchmarks.m2m [--persons 20000] [--members 5000]
+
+Times the resolution of the dependent records for a large ``pk_set`` by the chunked
+pk path of the m2m handler (``_pks_for_update``) against the subquery path
+of earlier versions (``_querysets_for_update`` on ``Person.objects.filter(pk__in=pks)``),
+and the end-to-end ``add``, ``remove`` and ``clear`` of group members.
+"""
+import argparse
+
+from . import setup, test_database, timed
+
+
+def run(persons, members, repeat):
+    from django.db import transaction, DatabaseError
+    from computedfields.models import active_resolver
+    from test_full.models import Group, Person
+
+    fields = active_resolver._m2m[Group.members.through]
+    group = Group.objects.create(name='group')
+    Person.objects.bulk_create([Person(name='person%d' % pos) for pos in range(persons)])
+    pks = list(Person.objects.values_list('pk', flat=True))
+    group.members.add(*pks[:10])
+
+    def pks_path():
+        active_resolver._pks_for_update(Person, pks, [fields['right']])
+
+    def legacy_path():
+        active_resolver._querysets_for_update(
+            Person, Person.objects.filter(pk__in=pks), [fields['right']], pk_list=True)
+
+    print('resolving %d person pks' % persons)
+    print('%24s%12.4fs' % ('pk chunks', timed(pks_path, repeat)))
+    try:
+        with transaction.atomic():
+            print('%24s%12.4fs' % ('legacy subquery', timed(legacy_path, repeat)))
+    except DatabaseError as exc:
+        # e.g. too many SQL variables on SQLite
+        print('%24s%13s  (%s)' % ('legacy subquery', '-', exc))
+
+    member_pks = pks[:members]
+    group.members.clear()
+    print('%d members' % members)
+    for action, func in (
+        ('add', lambda: group.members.add(*member_pks)),
+        ('remove', lambda: group.members.remove(*member_pks)),
+        ('add', lambda: group.members.add(*member_pks)),
+        ('clear', lambda: group.members.clear()),
+    ):
+        print('%24s%12.4fs' % (action, timed(func, 1)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--persons', type=int, default=20000)
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(argv)
+    setup()
+    with test_database():
+        run(options.persons, options.members, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -199,6 +199,40 @@ class XChild(models.Model):
     value = models.IntegerField()
 
 
+# COMPUTEDFIELDS_TRACK_CHANGES tests
+class TrackA(ComputedFieldsModel):
+    name = models.CharField(max_length=32)
+    note = models.CharField(max_length=32, default='')
+
+    @computed(models.CharField(max_length=32), depends=[['self', ['name']]])
+    def upper(self):
+        return self.name.upper()
+
+class TrackB(ComputedFieldsModel):
+    a = models.ForeignKey(TrackA, related_name='bs', on_delete=models.CASCADE)
+
+    @computed(models.CharField(max_length=32), depends=[['a', ['upper']]])
+    def comp(self):
+        return self.a.upper
+
+
+# batch methods
+class BatchParent(ComputedFieldsModel):
+    @computed(models.IntegerField(default=0), depends=[['children', ['value']]], batch=True)
+    def children_sum(instances):
+        sums = dict(BatchChild.objects.filter(parent__in=[i.pk for i in instances if i.pk])
+                    .values_list('parent').annotate(sum=models.Sum('value')))
+        return [sums.get(instance.pk, 0) for instance in instances]
+
+    @computed(models.IntegerField(default=0), depends=[['self', ['children_sum']]])
+    def double_sum(self):
+        return self.children_sum * 2
+
+class BatchChild(models.Model):
+    parent = models.ForeignKey(BatchParent, related_name='children', on_delete=models.CASCADE)
+    value = models.IntegerField()
+
+
 # update_dependent/update_dependent_multi tests
 class DepBaseA(ComputedFieldsModel):
     @computed(models.CharField(max_length=256), depends=[['sub1.sub2.subfinal', ['name']]])
@@ -433,7 +467,8 @@ class SubChildNotO(ComputedFieldsModel):
         depends=[
             ['parent', ['name']],
             ['parent.parent', ['name']]
-        ]
+        ],
+        auto_related=False
     )
     def parents(self):
         return self.name + '$' + self.parent.name + '$' + self.parent.parent.name
@@ -468,7 +503,8 @@ class ParentReverseNotO(ComputedFieldsModel):
         depends=[
             ['children', ['name']],
             ['children.subchildren', ['name']],
-        ]
+        ],
+        auto_related=False
     )
     def children_comp(self):
         s = []
@@ -931,3 +967,129 @@ class Work(ComputedFieldsModel):
     ])
     def descriptive_assigment(self):
         return '"{}" is assigned to "{}"'.format(self.subject, self.user.fullname)
+
+
+# database side computation with expressions
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+class ExprParent(ComputedFieldsModel):
+    name = models.CharField(max_length=32)
+
+    @computed(models.IntegerField(default=0), depends=[['children', ['parent', 'value']]],
+        expression=lambda: Coalesce(Subquery(ExprChild.objects
+            .filter(parent=OuterRef('pk'))
+            .values('parent')
+            .annotate(total=Sum('value'))
+            .values('total')), 0)
+    )
+    def total(self):
+        return self.children.all().aggregate(total=Sum('value'))['total'] or 0
+
+    @computed(models.IntegerField(default=0), depends=[['self', ['total']]])
+    def total_double(self):
+        return self.total * 2
+
+    @computed(models.IntegerField(default=0), depends=[['self', ['total_double']]],
+        expression=lambda: models.F('total_double') + 1
+    )
+    def total_double_inc(self):
+        return self.total_double + 1
+
+class ExprChild(models.Model):
+    parent = models.ForeignKey(ExprParent, related_name='children', on_delete=models.CASCADE)
+    value = models.IntegerField(default=0)
+
+
+# propagation of changed records only
+class PropC(models.Model):
+    value = models.IntegerField(default=0)
+
+class PropB(ComputedFieldsModel):
+    c = models.ForeignKey(PropC, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['c', ['value']]])
+    def parity(self):
+        return self.c.value % 2
+
+class PropBAlways(ComputedFieldsModel):
+    c = models.ForeignKey(PropC, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['c', ['value']]], always_propagate=True)
+    def parity(self):
+        return self.c.value % 2
+
+class PropA(ComputedFieldsModel):
+    b = models.ForeignKey(PropB, on_delete=models.CASCADE)
+    b_always = models.ForeignKey(PropBAlways, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['b', ['parity']], ['b_always', ['parity']]])
+    def parities(self):
+        return self.b.parity + self.b_always.parity
+
+
+# propagation with a redundant path A --> C besides A --> B --> C
+class RvA(models.Model):
+    x = models.IntegerField(default=0)
+
+class RvB(ComputedFieldsModel):
+    a = models.ForeignKey(RvA, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['a', ['x']]])
+    def parity(self):
+        return self.a.x % 2
+
+class RvC(ComputedFieldsModel):
+    b = models.ForeignKey(RvB, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['b.a', ['x']], ['b', ['parity']]])
+    def total(self):
+        return self.b.a.x + self.b.parity
+
+
+# ordered dependent model with several relation paths
+class OrdTag(models.Model):
+    name = models.CharField(max_length=32)
+
+class OrdDep(ComputedFieldsModel):
+    parent = models.ForeignKey('self', null=True, on_delete=models.CASCADE)
+    tags = models.ManyToManyField(OrdTag, related_name='deps')
+
+    class Meta:
+        ordering = ['-pk']
+
+    @computed(models.CharField(max_length=256), depends=[['tags', ['name']], ['parent.tags', ['name']]])
+    def names(self):
+        if not self.pk:
+            return ''
+        tags = list(self.tags.all())
+        if self.parent:
+            tags.extend(self.parent.tags.all())
+        return ','.join(sorted(tag.name for tag in tags))
+
+
+# diamond shaped dependencies A --> B, C --> D
+class DiamondA(models.Model):
+    value = models.IntegerField(default=0)
+
+class DiamondB(ComputedFieldsModel):
+    a = models.ForeignKey(DiamondA, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['a', ['value']]])
+    def comp(self):
+        return self.a.value + 1
+
+class DiamondC(ComputedFieldsModel):
+    a = models.ForeignKey(DiamondA, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['a', ['value']]])
+    def comp(self):
+        return self.a.value * 2
+
+class DiamondD(ComputedFieldsModel):
+    b = models.ForeignKey(DiamondB, on_delete=models.CASCADE)
+    c = models.ForeignKey(DiamondC, on_delete=models.CASCADE)
+
+    @computed(models.IntegerField(default=0), depends=[['b', ['comp']], ['c', ['comp']]])
+    def comp(self):
+        return self.b.comp + self.c.comp
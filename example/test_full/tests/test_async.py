@@ -0,0 +1,75 @@
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from ..models import Parent, Child, Subchild, ChainA, ChainB, ChainC
+from computedfields.models import (
+    aupdate_dependent, aupdate_dependent_multi, apreupdate_dependent, active_resolver)
+
+
+def counts(parent):
+    parent.refresh_from_db()
+    return parent.children_count, parent.subchildren_count, parent.subchildren_count_proxy
+
+
+class TestAsyncApi(TestCase):
+    def setUp(self):
+        self.p1 = Parent.objects.create()
+        self.p2 = Parent.objects.create()
+        self.c1 = Child.objects.create(parent=self.p1)
+        self.c2 = Child.objects.create(parent=self.p2)
+        for _ in range(3):
+            Subchild.objects.create(subparent=self.c1)
+
+    async def test_update_dependent(self):
+        queryset = Subchild.objects.all()
+        await sync_to_async(queryset.update)(subparent=self.c2)
+        # old relations are not updated without preupdate
+        await aupdate_dependent(queryset)
+        self.assertEqual(await sync_to_async(counts)(self.p2), (1, 3, 3))
+        self.assertEqual(await sync_to_async(counts)(self.p1), (1, 3, 3))
+
+    async def test_preupdate_dependent(self):
+        queryset = Subchild.objects.all()
+        old = await apreupdate_dependent(queryset)
+        await sync_to_async(queryset.update)(subparent=self.c2)
+        await aupdate_dependent(queryset, old=old)
+        self.assertEqual(await sync_to_async(counts)(self.p1), (1, 0, 0))
+        self.assertEqual(await sync_to_async(counts)(self.p2), (1, 3, 3))
+
+    async def test_update_dependent_multi(self):
+        a = await sync_to_async(ChainA.objects.create)(name='a')
+        b = await sync_to_async(ChainB.objects.create)(a=a)
+        c = await sync_to_async(ChainC.objects.create)(b=b)
+        await sync_to_async(ChainA.objects.filter(pk=a.pk).update)(name='x')
+        old = await active_resolver.apreupdate_dependent_multi([Subchild.objects.all()])
+        await sync_to_async(Subchild.objects.update)(subparent=self.c2)
+        await aupdate_dependent_multi([ChainA.objects.filter(pk=a.pk), Subchild.objects.all()], old=old)
+        await sync_to_async(c.refresh_from_db)()
+        self.assertEqual(c.comp, 'x')
+        self.assertEqual(await sync_to_async(counts)(self.p1), (1, 0, 0))
+        self.assertEqual(await sync_to_async(counts)(self.p2), (1, 3, 3))
+
+    async def test_bulk_updater(self):
+        await sync_to_async(Parent.objects.update)(children_count=0)
+        pks = await active_resolver.abulk_updater(Parent.objects.all(), None, return_pks=True)
+        self.assertEqual(pks, {self.p1.pk, self.p2.pk})
+        self.assertEqual(await sync_to_async(counts)(self.p1), (1, 3, 3))
+
+    async def test_cascade_all_or_nothing(self):
+        queryset = Subchild.objects.all()
+        old = await apreupdate_dependent(queryset)
+        await sync_to_async(queryset.update)(subparent=self.c2)
+        update_records = active_resolver._update_records
+
+        def fail_on_parent(queryset, *args):
+            if queryset.model == Parent:
+                raise ValueError
+            return update_records(queryset, *args)
+
+        with mock.patch.object(active_resolver, '_update_records', fail_on_parent):
+            with self.assertRaises(ValueError):
+                await aupdate_dependent(queryset, old=old)
+        # updates of the children got rolled back with the failing parent level
+        await sync_to_async(self.c1.refresh_from_db)()
+        await sync_to_async(self.c2.refresh_from_db)()
+        self.assertEqual((self.c1.subchildren_count, self.c2.subchildren_count), (3, 0))
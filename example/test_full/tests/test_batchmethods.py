@@ -0,0 +1,54 @@
+from unittest import mock
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..models import BatchParent, BatchChild
+from computedfields.models import active_resolver, update_dependent
+from computedfields.resolver import ResolverException
+
+
+class TestBatchMethods(TestCase):
+    def create(self, count):
+        parents = [BatchParent.objects.create() for _ in range(count)]
+        BatchChild.objects.bulk_create([BatchChild(parent=parent, value=i) for i, parent in enumerate(parents)])
+        return parents
+
+    def test_instance_save(self):
+        parent = BatchParent.objects.create()
+        self.assertEqual(parent.children_sum, 0)
+        BatchChild.objects.create(parent=parent, value=5)
+        parent.refresh_from_db()
+        self.assertEqual(parent.children_sum, 5)
+        self.assertEqual(parent.double_sum, 10)
+        self.assertEqual(active_resolver.compute(parent, 'double_sum'), 10)
+
+    def test_bulk_update(self):
+        parents = self.create(20)
+        update_dependent(BatchChild.objects.all())
+        self.assertEqual(
+            list(BatchParent.objects.order_by('pk').values_list('children_sum', 'double_sum')),
+            [(i, i*2) for i in range(20)])
+
+    def test_queries_per_chunk(self):
+        self.create(10)
+        with CaptureQueriesContext(connection) as few:
+            update_dependent(BatchChild.objects.all())
+        self.create(40)
+        BatchParent.objects.update(children_sum=0, double_sum=0)
+        with CaptureQueriesContext(connection) as many:
+            update_dependent(BatchChild.objects.all())
+        self.assertEqual(len(few), len(many))
+        with mock.patch.object(active_resolver, '_querysize', 10):
+            BatchParent.objects.update(children_sum=0, double_sum=0)
+            with mock.patch.object(BatchParent._meta.get_field('children_sum'), '_computed',
+                                   dict(BatchParent._meta.get_field('children_sum')._computed)) as computed:
+                computed['func'] = mock.Mock(wraps=computed['func'])
+                update_dependent(BatchChild.objects.all())
+                self.assertEqual(computed['func'].call_count, 5)
+
+    def test_wrong_length(self):
+        parent = BatchParent.objects.create()
+        field = BatchParent._meta.get_field('children_sum')
+        with mock.patch.dict(field._computed, {'func': lambda instances: []}):
+            with self.assertRaises(ResolverException):
+                parent.save()
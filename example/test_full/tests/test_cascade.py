@@ -0,0 +1,75 @@
+from unittest import mock
+from django.test import TestCase, TransactionTestCase
+from django.db import transaction
+from ..models import DiamondA, DiamondB, DiamondC, DiamondD
+from computedfields.models import active_resolver
+
+
+class TestDiamondCascade(TestCase):
+    def setUp(self):
+        self.a = DiamondA.objects.create(value=1)
+        self.b = DiamondB.objects.create(a=self.a)
+        self.c = DiamondC.objects.create(a=self.a)
+        self.d = DiamondD.objects.create(b=self.b, c=self.c)
+
+    def test_model_order(self):
+        rank = active_resolver._model_rank
+        self.assertLess(rank[DiamondA], rank[DiamondB])
+        self.assertLess(rank[DiamondA], rank[DiamondC])
+        self.assertLess(rank[DiamondB], rank[DiamondD])
+        self.assertLess(rank[DiamondC], rank[DiamondD])
+
+    def test_update_once(self):
+        active_resolver.reset_stats()
+        with mock.patch.object(active_resolver, '_update_records', wraps=active_resolver._update_records) as m:
+            self.a.value = 5
+            self.a.save()
+        models = [c[0][0].model for c in m.call_args_list]
+        self.assertEqual(models.count(DiamondD), 1)
+        self.assertEqual(models[-1], DiamondD)
+        self.assertEqual(active_resolver.stats['avoided_passes'], 1)
+        self.d.refresh_from_db()
+        self.assertEqual(self.d.comp, 16)
+
+
+class TestParallelCascade(TransactionTestCase):
+    def setUp(self):
+        self.old_parallel = active_resolver._parallel
+        # one worker thread, sqlite cannot write concurrently
+        active_resolver._parallel = 1
+        self.a = DiamondA.objects.create(value=1)
+        self.b = DiamondB.objects.create(a=self.a)
+        self.c = DiamondC.objects.create(a=self.a)
+        self.d = DiamondD.objects.create(b=self.b, c=self.c)
+
+    def tearDown(self):
+        active_resolver._parallel = self.old_parallel
+        if active_resolver._pool:
+            active_resolver._pool.shutdown()
+            active_resolver._pool = None
+
+    def test_independent_models(self):
+        self.assertEqual(active_resolver._independent_models({DiamondB: 1, DiamondC: 1, DiamondD: 1}),
+                         sorted([DiamondB, DiamondC], key=active_resolver._model_rank.get))
+        self.assertEqual(active_resolver._independent_models({DiamondA: 1, DiamondD: 1}), [DiamondA])
+
+    def test_parallel_branches(self):
+        active_resolver.reset_stats()
+        self.a.value = 5
+        self.a.save()
+        self.assertEqual(active_resolver.stats['parallel_branches'], 2)
+        self.b.refresh_from_db()
+        self.c.refresh_from_db()
+        self.d.refresh_from_db()
+        self.assertEqual(self.b.comp, 6)
+        self.assertEqual(self.c.comp, 10)
+        self.assertEqual(self.d.comp, 16)
+
+    def test_sequential_in_atomic(self):
+        active_resolver.reset_stats()
+        with transaction.atomic():
+            self.a.value = 5
+            self.a.save()
+        self.assertNotIn('parallel_branches', active_resolver.stats)
+        self.d.refresh_from_db()
+        self.assertEqual(self.d.comp, 16)
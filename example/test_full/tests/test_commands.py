@@ -1,10 +1,11 @@
 from .base import GenericModelTestBase
 from computedfields.models import active_resolver
+from computedfields.resolver import MAP_VERSION
 from computedfields.graph import CycleNodeException
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from io import StringIO
-import pickle
+import marshal
 from django.conf import settings
 import os
 
@@ -83,15 +84,15 @@ class CommandTests(GenericModelTestBase):
         settings.COMPUTEDFIELDS_MAP = os.path.join(settings.BASE_DIR, 'map.test')
         call_command('createmap', verbosity=0)
         with open(os.path.join(settings.BASE_DIR, 'map.test'), 'rb') as f:
-            pickled_data = pickle.load(f)
-            map = pickled_data['lookup_map']
-            fk_map = pickled_data['fk_map']
-            local_mro = pickled_data['local_mro']
-            hash = pickled_data['hash']
-            self.assertDictEqual(map, active_resolver._map)
-            self.assertDictEqual(fk_map, active_resolver._fk_map)
-            self.assertDictEqual(local_mro, active_resolver._local_mro)
-            self.assertEqual(hash, active_resolver._calc_modelhash())
+            compiled_data = marshal.load(f)
+            self.assertEqual(compiled_data['version'], MAP_VERSION)
+            self.assertEqual(compiled_data['hash'], active_resolver._calc_modelhash())
+        loaded = active_resolver._load_map()
+        self.assertDictEqual(loaded['lookup_map'], active_resolver._map)
+        self.assertDictEqual(loaded['fk_map'], active_resolver._fk_map)
+        self.assertDictEqual(loaded['local_mro'], active_resolver._local_mro)
+        self.assertDictEqual(loaded['m2m'], active_resolver._m2m)
+        self.assertDictEqual(loaded['model_rank'], active_resolver._model_rank)
         os.remove(os.path.join(settings.BASE_DIR, 'map.test'))
 
         # restore old  value
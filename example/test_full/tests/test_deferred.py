@@ -0,0 +1,102 @@
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import transaction
+from ..models import Parent, Child, Subchild
+from computedfields.models import active_resolver, batch
+
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.p = Parent.objects.create()
+        self.c = Child.objects.create(parent=self.p)
+
+    def test_deferred_until_exit(self):
+        with batch():
+            for _ in range(5):
+                Subchild.objects.create(subparent=self.c)
+            self.p.refresh_from_db()
+            self.c.refresh_from_db()
+            self.assertEqual(self.p.subchildren_count, 0)
+            self.assertEqual(self.c.subchildren_count, 0)
+        self.p.refresh_from_db()
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 5)
+        self.assertEqual(self.p.subchildren_count, 5)
+        self.assertEqual(self.p.subchildren_count_proxy, 5)
+
+    def test_update_once(self):
+        with mock.patch.object(active_resolver, '_update_records', wraps=active_resolver._update_records) as m:
+            with batch():
+                for _ in range(5):
+                    Child.objects.create(parent=self.p)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.children_count, 6)
+        parent_calls = [c for c in m.call_args_list if c[0][0].model == Parent]
+        self.assertEqual(len(parent_calls), 1)
+
+    def test_nested(self):
+        with batch():
+            with batch():
+                Child.objects.create(parent=self.p)
+            self.p.refresh_from_db()
+            self.assertEqual(self.p.children_count, 1)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.children_count, 2)
+
+    def test_delete_and_move(self):
+        p2 = Parent.objects.create()
+        c2 = Child.objects.create(parent=self.p)
+        with batch():
+            self.c.delete()
+            c2.parent = p2
+            c2.save()
+        self.p.refresh_from_db()
+        p2.refresh_from_db()
+        self.assertEqual(self.p.children_count, 0)
+        self.assertEqual(p2.children_count, 1)
+
+    def test_rollback_on_error(self):
+        with self.assertRaises(ValueError):
+            with batch():
+                Child.objects.create(parent=self.p)
+                raise ValueError
+        # saves of the block got rolled back together with the collected updates
+        self.assertEqual(Child.objects.filter(parent=self.p).count(), 1)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.children_count, 1)
+        # collector is gone, later saves update directly
+        Child.objects.create(parent=self.p)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.children_count, 2)
+
+
+@override_settings(COMPUTEDFIELDS_DEFERRED=True)
+class TestDeferredCommit(TransactionTestCase):
+    def test_on_commit(self):
+        p = Parent.objects.create()
+        with transaction.atomic():
+            for _ in range(3):
+                Child.objects.create(parent=p)
+            p.refresh_from_db()
+            self.assertEqual(p.children_count, 0)
+        p.refresh_from_db()
+        self.assertEqual(p.children_count, 3)
+
+    def test_autocommit(self):
+        p = Parent.objects.create()
+        Child.objects.create(parent=p)
+        p.refresh_from_db()
+        self.assertEqual(p.children_count, 1)
+
+    def test_rollback(self):
+        p = Parent.objects.create()
+        try:
+            with transaction.atomic():
+                Child.objects.create(parent=p)
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            Child.objects.create(parent=p)
+        p.refresh_from_db()
+        self.assertEqual(p.children_count, 1)
@@ -0,0 +1,80 @@
+from unittest import mock
+from django.test import TestCase
+from django.db import connection, transaction
+from django.db.models.signals import pre_delete
+from django.test.utils import CaptureQueriesContext
+from ..models import Parent, Child, Subchild
+from computedfields.models import active_resolver, batch
+from computedfields.handlers import get_delete_collector
+
+
+class TestBatchedDeletes(TestCase):
+    def setUp(self):
+        self.p = Parent.objects.create()
+        self.c1 = Child.objects.create(parent=self.p)
+        self.c2 = Child.objects.create(parent=self.p)
+        for _ in range(10):
+            Subchild.objects.create(subparent=self.c1)
+            Subchild.objects.create(subparent=self.c2)
+
+    def assertCounts(self, children, subchildren):
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.children_count, children)
+        self.assertEqual(self.p.subchildren_count, subchildren)
+        self.assertEqual(self.p.subchildren_count_proxy, subchildren)
+
+    def test_queryset_delete(self):
+        with mock.patch.object(active_resolver, '_update_cascade',
+                               wraps=active_resolver._update_cascade) as cascade:
+            Subchild.objects.filter(subparent=self.c1).delete()
+        cascade.assert_called_once()
+        self.assertCounts(2, 10)
+        self.c1.refresh_from_db()
+        self.assertEqual(self.c1.subchildren_count, 0)
+
+    def test_queries_independent_of_size(self):
+        with CaptureQueriesContext(connection) as few:
+            Subchild.objects.filter(pk__in=Subchild.objects.filter(subparent=self.c1)[:2]).delete()
+        with CaptureQueriesContext(connection) as many:
+            Subchild.objects.filter(subparent=self.c1).delete()
+        self.assertEqual(len(few), len(many))
+
+    def test_cascading_delete(self):
+        self.c1.delete()
+        self.assertCounts(1, 10)
+
+    def test_within_batch(self):
+        with batch():
+            Subchild.objects.filter(subparent=self.c1).delete()
+            self.assertCounts(2, 20)
+        self.assertCounts(2, 10)
+
+    def test_rolled_back_delete(self):
+        def fail(sender, **kwargs):
+            raise ValueError
+        pre_delete.connect(fail, sender=Subchild, dispatch_uid='TEST_FAIL')
+        try:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    Subchild.objects.filter(subparent=self.c1).delete()
+        finally:
+            pre_delete.disconnect(sender=Subchild, dispatch_uid='TEST_FAIL')
+        self.assertCounts(2, 20)
+        # stale collector of the failed deletion does not block later deletes
+        Subchild.objects.filter(subparent=self.c2).delete()
+        self.assertCounts(2, 10)
+
+    def test_resolving_statements(self):
+        sub = Subchild.objects.filter(subparent=self.c1).first()
+        execute = mock.Mock()
+        with transaction.atomic():
+            collector = get_delete_collector()
+            collector.add(Subchild, sub)
+            for sql in ['SELECT 1', '(SELECT 1) UNION (SELECT 2)', 'with x as (select 1) select * from x',
+                        'SAVEPOINT "s1"', 'RELEASE SAVEPOINT "s1"', 'ROLLBACK TO SAVEPOINT "s1"']:
+                collector.resolve_before_write(execute, sql, None, False, {})
+                self.assertTrue(collector.pending)
+            collector.resolve_before_write(execute, 'DELETE FROM "x"', None, False, {})
+            self.assertFalse(collector.pending)
+            self.assertEqual(execute.call_count, 7)
+            collector.discard()
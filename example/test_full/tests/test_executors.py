@@ -0,0 +1,160 @@
+import json
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.management import call_command
+from django.db import transaction
+from ..models import Parent, Child, Subchild, OrdDep, OrdTag
+from computedfields.models import UpdateJob, update_dependent_multi
+from computedfields.handlers import batch
+from computedfields.executors import get_executor, get_strongest_consistency, process_queue
+
+
+@override_settings(COMPUTEDFIELDS_CONSISTENCY={'test_full.Subchild': 'eventual'})
+class TestEventual(TestCase):
+    def setUp(self):
+        self.p = Parent.objects.create()
+        self.c = Child.objects.create(parent=self.p)
+
+    def test_queued(self):
+        Subchild.objects.create(subparent=self.c)
+        Subchild.objects.create(subparent=self.c)
+        self.assertEqual(UpdateJob.objects.count(), 2)
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 0)
+        self.assertEqual(process_queue(), 2)
+        self.assertEqual(UpdateJob.objects.count(), 0)
+        self.c.refresh_from_db()
+        self.p.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 2)
+        self.assertEqual(self.p.subchildren_count, 2)
+        self.assertEqual(self.p.subchildren_count_proxy, 2)
+
+    def test_command(self):
+        Subchild.objects.create(subparent=self.c)
+        call_command('processupdates')
+        self.assertEqual(UpdateJob.objects.count(), 0)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.subchildren_count_proxy, 1)
+
+    def test_failing_job(self):
+        bad = UpdateJob.objects.create(data=json.dumps([['test_full.Unknown', [1], None]]))
+        Subchild.objects.create(subparent=self.c)
+        with mock.patch('computedfields.executors.logger') as logger:
+            # the failing job does not block the following job
+            self.assertEqual(process_queue(), 1)
+        logger.exception.assert_called_once()
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn('LookupError', bad.error)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.subchildren_count_proxy, 1)
+        # retried until COMPUTEDFIELDS_QUEUE_RETRIES, then skipped
+        with mock.patch('computedfields.executors.logger'):
+            process_queue()
+            process_queue()
+            self.assertEqual(process_queue(), 0)
+        bad.refresh_from_db()
+        self.assertEqual(bad.attempts, 3)
+        self.assertEqual(list(UpdateJob.objects.all()), [bad])
+
+    def test_old_relations(self):
+        c2 = Child.objects.create(parent=self.p)
+        s = Subchild.objects.create(subparent=self.c)
+        process_queue()
+        s.subparent = c2
+        s.save()
+        process_queue()
+        self.c.refresh_from_db()
+        c2.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 0)
+        self.assertEqual(c2.subchildren_count, 1)
+
+    def test_delete(self):
+        s = Subchild.objects.create(subparent=self.c)
+        process_queue()
+        s.delete()
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 1)
+        process_queue()
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 0)
+
+    def test_batch(self):
+        with batch():
+            Subchild.objects.create(subparent=self.c)
+            Subchild.objects.create(subparent=self.c)
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        process_queue()
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.subchildren_count_proxy, 2)
+
+    def test_multi(self):
+        Subchild.objects.bulk_create([Subchild(subparent=self.c)])
+        update_dependent_multi([Subchild.objects.all()])
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        # a sync model in the same call keeps the updates synchronous
+        Subchild.objects.bulk_create([Subchild(subparent=self.c)])
+        update_dependent_multi([Subchild.objects.all(), Child.objects.all()])
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.subchildren_count, 2)
+
+    def test_strongest_consistency(self):
+        self.assertEqual(get_strongest_consistency([Subchild]), 'eventual')
+        self.assertEqual(get_strongest_consistency([Subchild, Child]), 'sync')
+        with override_settings(COMPUTEDFIELDS_CONSISTENCY={'test_full.Subchild': 'eventual',
+                                                           'test_full.Child': 'async'}):
+            self.assertEqual(get_strongest_consistency([Subchild, Child]), 'eventual')
+
+
+@override_settings(COMPUTEDFIELDS_CONSISTENCY={'test_full.OrdDep': 'eventual', 'test_full.OrdTag': 'eventual'})
+class TestEventualM2M(TestCase):
+    def setUp(self):
+        self.dep = OrdDep.objects.create()
+        self.tag = OrdTag.objects.create(name='a')
+
+    def names(self):
+        self.dep.refresh_from_db()
+        return self.dep.names
+
+    def test_add_remove_clear(self):
+        self.dep.tags.add(self.tag)
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        self.assertEqual(self.names(), '')
+        process_queue()
+        self.assertEqual(self.names(), 'a')
+        self.dep.tags.remove(self.tag)
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        process_queue()
+        self.assertEqual(self.names(), '')
+        self.dep.tags.add(self.tag)
+        process_queue()
+        self.dep.tags.clear()
+        self.assertEqual(UpdateJob.objects.count(), 1)
+        self.assertEqual(self.names(), 'a')
+        process_queue()
+        self.assertEqual(self.names(), '')
+
+
+@override_settings(COMPUTEDFIELDS_CONSISTENCY={'test_full.Subchild': 'async'})
+class TestAsync(TransactionTestCase):
+    def test_sync_executor(self):
+        p = Parent.objects.create()
+        c = Child.objects.create(parent=p)
+        with override_settings(COMPUTEDFIELDS_EXECUTOR='sync'):
+            with transaction.atomic():
+                Subchild.objects.create(subparent=c)
+                c.refresh_from_db()
+                self.assertEqual(c.subchildren_count, 0)
+        c.refresh_from_db()
+        self.assertEqual(c.subchildren_count, 1)
+
+    def test_thread_executor(self):
+        p = Parent.objects.create()
+        c = Child.objects.create(parent=p)
+        with override_settings(COMPUTEDFIELDS_EXECUTOR='thread'):
+            Subchild.objects.create(subparent=c)
+            get_executor().wait()
+        p.refresh_from_db()
+        self.assertEqual(p.subchildren_count_proxy, 1)
@@ -0,0 +1,54 @@
+from unittest import mock
+from django.test import TestCase
+from ..models import ExprParent, ExprChild
+from computedfields.models import active_resolver, update_dependent
+
+
+class TestExpressionFields(TestCase):
+    def setUp(self):
+        self.p = ExprParent.objects.create(name='p')
+
+    def test_init(self):
+        self.assertEqual(self.p.total, 0)
+        self.assertEqual(self.p.total_double, 0)
+        self.assertEqual(self.p.total_double_inc, 1)
+
+    def test_runs(self):
+        self.assertEqual(
+            active_resolver._mro_runs(ExprParent, ['total', 'total_double', 'total_double_inc']),
+            [(True, ['total']), (False, ['total_double']), (True, ['total_double_inc'])])
+
+    def test_update(self):
+        ExprChild.objects.create(parent=self.p, value=10)
+        ExprChild.objects.create(parent=self.p, value=5)
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.total, 15)
+        self.assertEqual(self.p.total_double, 30)
+        self.assertEqual(self.p.total_double_inc, 31)
+
+    def test_no_method_calls(self):
+        ExprChild.objects.create(parent=self.p, value=10)
+        with mock.patch.object(active_resolver, '_compute', wraps=active_resolver._compute) as m:
+            ExprChild.objects.all().update(value=20)
+            update_dependent(ExprChild.objects.all())
+        self.assertEqual([c[0][2] for c in m.call_args_list], ['total_double'])
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.total, 20)
+        self.assertEqual(self.p.total_double_inc, 41)
+
+    def test_delete(self):
+        c = ExprChild.objects.create(parent=self.p, value=10)
+        c.delete()
+        self.p.refresh_from_db()
+        self.assertEqual(self.p.total, 0)
+        self.assertEqual(self.p.total_double_inc, 1)
+
+    def test_chunks_refetch(self):
+        queryset = ExprParent.objects.all()[:1]
+        self.assertEqual(list(queryset)[0].total, 0)
+        ExprParent.objects.filter(pk=self.p.pk).update(total=7)
+        # a later run must not see the result cache of the queryset
+        chunks = list(active_resolver._iter_chunks(queryset))
+        self.assertEqual([elem.total for chunk in chunks for elem in chunk], [7])
+        chunks = list(active_resolver._iter_chunks(ExprParent.objects.all()))
+        self.assertEqual([elem.total for chunk in chunks for elem in chunk], [7])
@@ -1,6 +1,11 @@
+import os
+import tempfile
+from io import StringIO
 from django.test import TestCase
 from ..models import FixtureParent, FixtureChild
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from computedfields.helper import get_models, ComputedFieldsException
 from contextlib import contextmanager
 from json import dumps, loads
 
@@ -51,7 +56,7 @@ class TestUpdatedata(TestCase):
         self.assertEqual(any(FixtureChild.objects.all().values_list('path', flat=True)), False)
 
     def test_computedfields_resync(self):
-        call_command('updatedata')  # expensive since resyncing all cfs in test models (~120ms)
+        call_command('updatedata', verbosity=0)  # expensive since resyncing all cfs in test models (~120ms)
         self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [10, 0, 0])
         self.assertEqual(
             list(FixtureChild.objects.all().values_list('path', flat=True)),
@@ -72,3 +77,65 @@ class TestUpdatedata(TestCase):
             list(FixtureChild.objects.all().values_list('path', flat=True)),
             ['/A#10/' + str(i) for i in range(10)]
         )
+
+    def test_resync_selected_model(self):
+        # partial updates also update dependent models
+        call_command('updatedata', 'test_full.FixtureParent', chunksize=2, verbosity=0)
+        self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [10, 0, 0])
+        self.assertEqual(
+            list(FixtureChild.objects.all().values_list('path', flat=True)),
+            ['/A#10/' + str(i) for i in range(10)]
+        )
+
+    def test_resync_selected_field(self):
+        out = StringIO()
+        call_command('updatedata', 'test_full.FixtureParent.children_count', stdout=out)
+        self.assertIn('test_full.FixtureParent: 3 rows', out.getvalue())
+        self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [10, 0, 0])
+
+    def test_unknown_labels(self):
+        with self.assertRaisesMessage(CommandError, 'unknown model "test_full.Nope"'):
+            call_command('updatedata', 'test_full.Nope', verbosity=0)
+        with self.assertRaisesMessage(CommandError, '"name" is not a computed field of "test_full.FixtureParent"'):
+            call_command('updatedata', 'test_full.FixtureParent.name', verbosity=0)
+        with self.assertRaisesMessage(CommandError, 'model "test_full.ExprChild" has no computed fields'):
+            call_command('checkdata', 'test_full.ExprChild', verbosity=0)
+        with self.assertRaisesMessage(ComputedFieldsException, 'unknown model "test_full.Nope"'):
+            get_models(['test_full.Nope'])
+
+    def test_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            checkpoint = os.path.join(tmpdir, 'checkpoint.json')
+            # resume a run with parents done and children processed up to the last pk
+            last = FixtureChild.objects.order_by('pk').last().pk
+            with open(checkpoint, 'w') as f:
+                f.write(dumps({'done': ['test_full.FixtureParent'], 'last': {'test_full.FixtureChild': last}}))
+            call_command('updatedata', 'test_full.FixtureParent', 'test_full.FixtureChild',
+                         checkpoint=checkpoint, verbosity=0)
+            self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [0, 0, 0])
+            self.assertEqual(any(FixtureChild.objects.all().values_list('path', flat=True)), False)
+            # finished run removes the checkpoint
+            self.assertFalse(os.path.exists(checkpoint))
+            call_command('updatedata', 'test_full.FixtureParent', checkpoint=checkpoint, verbosity=0)
+            self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [10, 0, 0])
+
+    def test_checkdata(self):
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'found 11 drifted computed field values'):
+            call_command('checkdata', 'test_full.FixtureParent', 'test_full.FixtureChild',
+                         chunksize=4, samples=2, stdout=out)
+        self.assertIn('test_full.FixtureChild: 10 rows checked, 10 drifted values', out.getvalue())
+        self.assertIn('  path: 10 (pks ', out.getvalue())
+        self.assertIn('test_full.FixtureParent: 3 rows checked, 1 drifted values', out.getvalue())
+        # nothing written
+        self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [0, 0, 0])
+
+    def test_checkdata_repair(self):
+        call_command('checkdata', '--repair', verbosity=0)
+        self.assertEqual(list(FixtureParent.objects.all().values_list('children_count', flat=True)), [10, 0, 0])
+        self.assertEqual(
+            list(FixtureChild.objects.all().values_list('path', flat=True)),
+            ['/A#10/' + str(i) for i in range(10)]
+        )
+        # no drift left
+        call_command('checkdata', verbosity=0)
@@ -0,0 +1,121 @@
+from unittest import mock
+from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..models import XParent, XChild
+from computedfields.models import active_resolver
+from computedfields.handlers import connect_handlers
+
+
+class TestFkSnapshot(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(active_resolver, '_track_changes', True)
+        patcher.start()
+        # connects post_init for the fk models
+        connect_handlers(active_resolver)
+        self.addCleanup(connect_handlers, active_resolver)
+        self.addCleanup(patcher.stop)
+        self.p1 = XParent.objects.create()
+        self.p2 = XParent.objects.create()
+        XChild.objects.create(parent=self.p1, value=1)
+
+    def test_unchanged_fk(self):
+        child = XChild.objects.get()
+        child.value = 5
+        with mock.patch.object(active_resolver, 'preupdate_dependent',
+                               wraps=active_resolver.preupdate_dependent) as preupdate:
+            child.save()
+        preupdate.assert_not_called()
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.children_value, 5)
+
+    def test_changed_fk(self):
+        child = XChild.objects.get()
+        child.parent = self.p2
+        with mock.patch.object(active_resolver, 'preupdate_dependent',
+                               wraps=active_resolver.preupdate_dependent) as preupdate:
+            child.save()
+            # snapshot got updated by the save
+            child.value = 3
+            child.save()
+        self.assertEqual(preupdate.call_count, 1)
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p1.children_value, 0)
+        self.assertEqual(self.p2.children_value, 3)
+
+    def test_deferred_fk(self):
+        child = XChild.objects.only('value').get()
+        child.value = 2
+        with mock.patch.object(active_resolver, 'preupdate_dependent',
+                               wraps=active_resolver.preupdate_dependent) as preupdate:
+            child.save()
+            preupdate.assert_not_called()
+            child = XChild.objects.only('value').get()
+            child.parent = self.p2
+            child.save()
+            preupdate.assert_called_once()
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p1.children_value, 0)
+        self.assertEqual(self.p2.children_value, 2)
+
+    def test_queries(self):
+        child = XChild.objects.get()
+        child.value = 2
+        with CaptureQueriesContext(connection) as with_snapshot:
+            child.save()
+        del child._computedfields_fks
+        child.value = 3
+        with CaptureQueriesContext(connection) as without_snapshot:
+            child.save()
+        self.assertLess(len(with_snapshot), len(without_snapshot))
+
+    def test_refresh(self):
+        child = XChild.objects.get()
+        other = XChild.objects.get()
+        other.parent = self.p2
+        other.save()
+        # the reload moves the snapshot to p2
+        child.refresh_from_db()
+        self.assertEqual(child._computedfields_fks, {'parent_id': self.p2.pk})
+        child.parent = self.p1
+        child.save()
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p1.children_value, 1)
+        self.assertEqual(self.p2.children_value, 0)
+
+    def test_refresh_fields(self):
+        child = XChild.objects.only('value').get()
+        XChild.objects.update(parent=self.p2)
+        child.refresh_from_db(fields=['parent'])
+        self.assertEqual(child._computedfields_fks, {'parent_id': self.p2.pk})
+
+
+class TestFkNoSnapshot(TestCase):
+    def setUp(self):
+        self.p1 = XParent.objects.create()
+        self.p2 = XParent.objects.create()
+        XChild.objects.create(parent=self.p1, value=1)
+
+    def test_no_snapshot(self):
+        child = XChild.objects.get()
+        self.assertNotIn('_computedfields_fks', child.__dict__)
+        child.save()
+        self.assertNotIn('_computedfields_fks', child.__dict__)
+
+    def test_stale_instance(self):
+        child = XChild.objects.get()
+        other = XChild.objects.get()
+        other.parent = self.p2
+        other.save()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p2.children_value, 1)
+        # the old relation comes from the database, not from the stale instance
+        child.value = 5
+        child.save()
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual(self.p1.children_value, 5)
+        self.assertEqual(self.p2.children_value, 0)
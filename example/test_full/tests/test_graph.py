@@ -80,10 +80,11 @@ class GraphTests(TestCase):
         # add third cycle
         graph.add_edge(Edge(nodes[5], nodes[4]))
         self.assertEqual(len(graph.node_cycles), 3)
-        # add tricky edge (adds multiple cycles at once)
+        # add tricky edge (adds another elementary cycle C-D-E-C)
         graph.add_edge(Edge(nodes[4], nodes[2]))
-        self.assertGreater(len(graph.node_cycles), 4)
-        self.assertGreater(len(graph.edge_cycles), 4)
+        self.assertEqual(len(graph.node_cycles), 4)
+        self.assertEqual(len(graph.edge_cycles), 4)
+        self.assertFalse(graph.is_cyclefree)
 
     def test_raise_cycle_exceptions(self):
         nodes = [Node('A'), Node('B'), Node('C'), Node('D'), Node('E'), Node('F')]
@@ -106,3 +107,26 @@ class GraphTests(TestCase):
         except CycleNodeException as e:
             self.assertIn(e.args[0], [[nodes[0], nodes[1], nodes[0]],
                                       [nodes[1], nodes[0], nodes[1]]])
+
+    def test_remove_redundant(self):
+        a, b, c, d = Node('A'), Node('B'), Node('C'), Node('D')
+        graph = Graph()
+        for edge in [Edge(a, b), Edge(b, c), Edge(c, d), Edge(a, c), Edge(a, d), Edge(b, d)]:
+            graph.add_edge(edge)
+        removed = graph.remove_redundant()
+        self.assertEqual(removed, {Edge(a, c), Edge(a, d), Edge(b, d)})
+        self.assertEqual(graph.edges, {Edge(a, b), Edge(b, c), Edge(c, d)})
+        # cycles raise with the cycle as node path
+        graph.add_edge(Edge(d, b))
+        with self.assertRaises(CycleNodeException) as cm:
+            graph.remove_redundant()
+        self.assertIn(cm.exception.args[0], [[b, c, d, b], [c, d, b, c], [d, b, c, d]])
+
+    def test_cycle_entries(self):
+        a, b, c = Node('A'), Node('B'), Node('C')
+        graph = Graph()
+        for edge in [Edge(a, b), Edge(b, c), Edge(c, b)]:
+            graph.add_edge(edge)
+        cycles = graph.get_cycles()
+        self.assertEqual(list(cycles), [frozenset([Edge(b, c), Edge(c, b)])])
+        self.assertEqual(list(cycles.values())[0]['entries'], {Edge(a, b), Edge(b, c), Edge(c, b)})
@@ -1,8 +1,9 @@
+from unittest import mock
 from django.test import TestCase
-from ..models import Person, Group, Membership
+from ..models import Person, Group, Membership, OrdTag, OrdDep
 from django.test.utils import CaptureQueriesContext
 from django.db import connection
-from computedfields.models import update_dependent
+from computedfields.models import update_dependent, active_resolver
 
 
 class SelfDeps(TestCase):
@@ -76,3 +77,68 @@ class SelfDeps(TestCase):
         g0 = self.groups[0]
         g0.refresh_from_db()
         self.assertEqual(g0.my_members, 'P1') # should be 'P1', not 'P0,P1'
+
+
+class M2MPkSets(TestCase):
+    def setUp(self):
+        self.persons = [Person.objects.create(name='P{}'.format(i)) for i in range(10)]
+        self.group = Group.objects.create(name='A')
+
+    def test_chunked_add_remove(self):
+        with mock.patch.object(active_resolver, '_querysize', 3):
+            self.group.members.add(*self.persons)
+            self.group.refresh_from_db()
+            self.assertEqual(self.group.my_members, ','.join('P{}'.format(i) for i in range(10)))
+            self.assertEqual(set(Person.objects.values_list('my_groups', flat=True)), {'A'})
+            self.group.members.remove(*self.persons[:5])
+            self.assertEqual(
+                list(Person.objects.order_by('pk').values_list('my_groups', flat=True)), ['']*5 + ['A']*5)
+
+    def test_clear_from_through(self):
+        self.group.members.add(*self.persons)
+        self.group.members.clear()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.my_members, '')
+        self.assertEqual(set(Person.objects.values_list('my_groups', flat=True)), {''})
+        self.persons[0].groups.add(self.group)
+        self.persons[0].groups.clear()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.my_members, '')
+
+    def test_pk_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = active_resolver._pks_for_update(Person, [p.pk for p in self.persons], ['groups'])
+        self.assertEqual(data, {})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"test_full_person"', queries[0]['sql'])
+
+
+class M2MOrderedPaths(TestCase):
+    def setUp(self):
+        self.tags = [OrdTag.objects.create(name='t{}'.format(i)) for i in range(10)]
+        self.parent = OrdDep.objects.create()
+        self.child = OrdDep.objects.create(parent=self.parent)
+
+    def test_add_remove_clear(self):
+        # dependent with Meta.ordering reachable by two paths
+        self.parent.tags.add(*self.tags[:2])
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.names, 't0,t1')
+        self.parent.tags.remove(self.tags[0])
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.names, 't1')
+        self.parent.tags.clear()
+        self.child.refresh_from_db()
+        self.assertEqual(self.child.names, '')
+
+    def test_chunk_queries(self):
+        # one UNION query per chunk of pks
+        with mock.patch.object(active_resolver, '_querysize', 3):
+            with CaptureQueriesContext(connection) as queries:
+                data = active_resolver._pks_for_update(OrdTag, [tag.pk for tag in self.tags], ['deps'])
+        self.assertEqual(data, {})
+        self.assertEqual(len(queries), 4)
+        self.parent.tags.add(*self.tags)
+        with mock.patch.object(active_resolver, '_querysize', 3):
+            data = active_resolver._pks_for_update(OrdTag, [tag.pk for tag in self.tags], ['deps'])
+        self.assertEqual(data, {OrdDep: [{self.parent.pk, self.child.pk}, {'names'}]})
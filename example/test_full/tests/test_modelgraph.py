@@ -1,5 +1,5 @@
 from django.test import TestCase
-from computedfields.graph import ModelGraph, Edge, Node
+from computedfields.graph import ModelGraph, Edge, Node, CycleNodeException
 from computedfields.models import active_resolver
 from ..models import SelfA, SelfB
 
@@ -70,3 +70,32 @@ class TestModelGraph(TestCase):
             if field == '##':
                 continue
             self.assertEqual(mro_helper(base, fields[field]), paths)
+
+    def test_local_masks(self):
+        self.ga.transitive_reduction()
+        mapping = self.ga.generate_local_mapping(self.ga.generate_field_paths(self.ga.get_topological_paths()))
+        self.assertEqual(self.ga.generate_local_masks(), mapping)
+
+    def test_cycle(self):
+        graph = ModelGraph(SelfA, {'c1': ['c2'], 'c2': ['c1']}, ['c1', 'c2'])
+        with self.assertRaises(CycleNodeException):
+            graph.get_topological_paths()
+
+
+class TestLongChain(TestCase):
+    def test_beyond_recursion_limit(self):
+        import sys
+        length = sys.getrecursionlimit() + 500
+        names = ['c%d' % i for i in range(length)]
+        deps = dict((right, [left]) for left, right in zip(names, names[1:]))
+        deps[names[0]] = ['name']
+        graph = ModelGraph(SelfA, deps, names)
+        graph.transitive_reduction()
+        self.assertEqual([edge for edge in graph.edges if edge.left == Node('##')], [Edge(Node('##'), Node('c0'))])
+        paths = graph.get_topological_paths()
+        self.assertEqual(paths[Node('##')], [Node(name) for name in names])
+        self.assertEqual(paths[Node('name')], [Node(name) for name in names])
+        self.assertEqual(paths[Node(names[-2])], [Node(names[-2]), Node(names[-1])])
+        mapping = graph.generate_local_masks()
+        self.assertEqual(mapping['base'], names)
+        self.assertEqual(mapping['fields']['name'], (1 << length) - 1)
@@ -1,5 +1,6 @@
 from django.test import TestCase
 from .. import models
+from computedfields.models import active_resolver
 
 
 class TestMultipleComp(TestCase):
@@ -38,3 +39,49 @@ class TestMultipleComp(TestCase):
         self.assertEqual(self.ref.lower_a, 'sourcechanged')
         self.assertEqual(self.ref.upper_b, 'SOURCECHANGED')
         self.assertEqual(self.ref.lower_b, 'sourcechanged')
+
+
+class TestMultiplePathResolution(TestCase):
+    def setUp(self):
+        self.s1 = models.MultipleCompSource.objects.create(name='s1')
+        self.s2 = models.MultipleCompSource.objects.create(name='s2')
+        self.r1 = models.MultipleCompRef.objects.create(a=self.s1, b=self.s1)
+        self.r2 = models.MultipleCompRef.objects.create(a=self.s1, b=self.s2)
+        self.r3 = models.MultipleCompRef.objects.create(a=self.s2, b=self.s2)
+
+    def test_pk_list_single_query(self):
+        with self.assertNumQueries(1):
+            data = active_resolver._querysets_for_update(models.MultipleCompSource, self.s1, pk_list=True)
+        self.assertEqual(data[models.MultipleCompRef][0], {self.r1.pk, self.r2.pk})
+
+    def test_queryset_deduplicated(self):
+        data = active_resolver._querysets_for_update(
+            models.MultipleCompSource, models.MultipleCompSource.objects.all())
+        queryset = data[models.MultipleCompRef][0]
+        self.assertIn('UNION', str(queryset.query))
+        self.assertEqual(sorted(queryset.values_list('pk', flat=True)), [self.r1.pk, self.r2.pk, self.r3.pk])
+
+
+class TestOrderedMultiplePaths(TestCase):
+    def setUp(self):
+        self.tag = models.OrdTag.objects.create(name='a')
+        self.parent = models.OrdDep.objects.create()
+        self.child = models.OrdDep.objects.create(parent=self.parent)
+        # through record without m2m_changed signal
+        models.OrdDep.tags.through.objects.create(orddep=self.parent, ordtag=self.tag)
+        self.parent.save()
+        self.child.save()
+
+    def test_save(self):
+        # Meta.ordering must not end up in the UNION parts
+        self.assertEqual(self.child.names, 'a')
+        self.tag.name = 'b'
+        self.tag.save()
+        self.parent.refresh_from_db()
+        self.child.refresh_from_db()
+        self.assertEqual(self.parent.names, 'b')
+        self.assertEqual(self.child.names, 'b')
+
+    def test_pk_list(self):
+        data = active_resolver._querysets_for_update(models.OrdTag, self.tag, pk_list=True)
+        self.assertEqual(data[models.OrdDep][0], {self.parent.pk, self.child.pk})
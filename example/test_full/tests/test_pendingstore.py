@@ -0,0 +1,89 @@
+import gc
+from threading import Thread
+from django.test import TestCase
+from django.db import transaction
+from ..models import Parent
+from computedfields.handlers import PendingStore, batch, get_collector
+
+
+class TestPendingStore(TestCase):
+    def setUp(self):
+        self.store = PendingStore('test_store')
+        self.p1 = Parent.objects.create()
+        self.p2 = Parent.objects.create()
+
+    def entries(self):
+        return self.store._entries.get() or {}
+
+    def test_set_pop(self):
+        self.store.set(self.p1, 'data')
+        # keyed by instance, not by pk equality
+        self.assertIsNone(self.store.pop(Parent.objects.get(pk=self.p1.pk)))
+        self.assertEqual(self.store.pop(self.p1), 'data')
+        self.assertIsNone(self.store.pop(self.p1))
+
+    def test_rollback(self):
+        try:
+            with transaction.atomic():
+                self.store.set(self.p1, 'data')
+                raise ValueError
+        except ValueError:
+            pass
+        self.store.set(self.p2, 'other')
+        self.assertEqual(len(self.entries()), 1)
+        self.assertIsNone(self.store.pop(self.p1))
+        self.assertEqual(self.store.pop(self.p2), 'other')
+
+    def test_instance_collected(self):
+        instance = Parent.objects.get(pk=self.p1.pk)
+        self.store.set(instance, 'data')
+        self.assertEqual(len(self.entries()), 1)
+        del instance
+        gc.collect()
+        self.assertEqual(len(self.entries()), 0)
+
+    def test_threads(self):
+        self.store.set(self.p1, 'data')
+        result = []
+        thread = Thread(target=lambda: result.append(self.store.pop(self.p1, 'missing')))
+        thread.start()
+        thread.join()
+        self.assertEqual(result, ['missing'])
+        self.assertEqual(self.store.pop(self.p1), 'data')
+
+    def test_batch_per_thread(self):
+        result = []
+        with batch() as collector:
+            self.assertIs(get_collector(), collector)
+            thread = Thread(target=lambda: result.append(get_collector()))
+            thread.start()
+            thread.join()
+        self.assertEqual(result, [None])
+        self.assertIsNone(get_collector())
+
+    def test_no_rescan(self):
+        with transaction.atomic():
+            connection = transaction.get_connection()
+            connection.run_on_commit = _NoIter(connection.run_on_commit)
+            try:
+                self.store.set(self.p1, 'data')
+                # hook list unchanged - no scan needed
+                self.store.set(self.p2, 'other')
+                self.assertEqual(len(self.entries()), 2)
+            finally:
+                connection.run_on_commit = list.copy(connection.run_on_commit)
+            try:
+                with transaction.atomic():
+                    self.store.set(self.p1, 'inner')
+                    raise ValueError
+            except ValueError:
+                pass
+            # savepoint rollback replaced the list, hook of the outer block still pending
+            self.store.set(self.p2, 'again')
+            self.assertIsNone(self.store.pop(self.p1))
+            self.assertEqual(self.store.pop(self.p2), 'again')
+
+
+class _NoIter(list):
+    def __iter__(self):
+        raise AssertionError('run_on_commit scanned')
@@ -0,0 +1,60 @@
+from unittest import mock
+from django.test import TestCase
+from ..models import PropA, PropB, PropBAlways, PropC, RvA, RvB, RvC
+from computedfields.models import active_resolver
+
+
+class TestChangedPropagation(TestCase):
+    def setUp(self):
+        self.c = PropC.objects.create(value=1)
+        self.b = PropB.objects.create(c=self.c)
+        self.b_always = PropBAlways.objects.create(c=self.c)
+        self.a = PropA.objects.create(b=self.b, b_always=self.b_always)
+
+    def descents(self, m):
+        return [c for c in m.call_args_list if c[0][0].model == PropA]
+
+    def test_changed(self):
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.parities, 2)
+        self.c.value = 2
+        self.c.save()
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.parities, 0)
+
+    def test_unchanged_stops(self):
+        with mock.patch.object(active_resolver, '_update_records', wraps=active_resolver._update_records) as m:
+            self.c.value = 3
+            self.c.save()
+        # only descended from PropBAlways
+        self.assertEqual(len(self.descents(m)), 1)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.parities, 2)
+
+    def test_changed_pks_only(self):
+        c2 = PropC.objects.create(value=1)
+        b2 = PropB.objects.create(c=c2)
+        a2 = PropA.objects.create(b=b2, b_always=self.b_always)
+        PropC.objects.filter(pk=self.c.pk).update(value=3)
+        PropC.objects.filter(pk=c2.pk).update(value=2)
+        with mock.patch.object(active_resolver, '_update_records', wraps=active_resolver._update_records) as m:
+            active_resolver.bulk_updater(PropB.objects.all(), None)
+        pks = [set(c[0][0].values_list('pk', flat=True)) for c in self.descents(m)]
+        self.assertEqual(pks, [{a2.pk}])
+        a2.refresh_from_db()
+        self.assertEqual(a2.parities, 1)
+
+
+class TestRedundantPath(TestCase):
+    def test_unchanged_intermediate(self):
+        a = RvA.objects.create(x=1)
+        b = RvB.objects.create(a=a)
+        c = RvC.objects.create(b=b)
+        c.refresh_from_db()
+        self.assertEqual(c.total, 2)
+        # parity stays the same, total still depends on x directly
+        a.x = 3
+        a.save()
+        c.refresh_from_db()
+        self.assertEqual(c.total, 4)
+        self.assertIn(RvC, active_resolver._map[RvA]['x'])
@@ -0,0 +1,52 @@
+from unittest import mock
+from django.test import TestCase
+from ..models import Parent, Child, Subchild
+from computedfields.models import active_resolver
+
+
+class TestQuerysize(TestCase):
+    def setUp(self):
+        self.old_querysize = active_resolver._querysize
+        active_resolver._querysize = 3
+        active_resolver.reset_stats()
+        self.parents = [Parent.objects.create() for _ in range(10)]
+        for p in self.parents:
+            for _ in range(2):
+                Child.objects.create(parent=p)
+
+    def tearDown(self):
+        active_resolver._querysize = self.old_querysize
+
+    def test_chunked_update(self):
+        Child.objects.all().update(parent=self.parents[0])
+        active_resolver.reset_stats()
+        active_resolver.update_dependent(Parent.objects.all())
+        for p in Parent.objects.all():
+            self.assertEqual(p.children_count, 20 if p.pk == self.parents[0].pk else 0)
+        self.assertEqual(active_resolver.stats['peak_instances'], 3)
+
+    def test_return_pks(self):
+        pks = active_resolver.bulk_updater(Parent.objects.all(), None, return_pks=True)
+        self.assertEqual(pks, set(p.pk for p in self.parents))
+
+    def test_descent(self):
+        c = Child.objects.filter(parent=self.parents[5]).first()
+        for _ in range(4):
+            Subchild.objects.create(subparent=c)
+        Subchild.objects.all().update(subparent=Child.objects.filter(parent=self.parents[7]).first())
+        active_resolver.update_dependent(Subchild.objects.all())
+        active_resolver.update_dependent(Child.objects.all())
+        self.parents[5].refresh_from_db()
+        self.parents[7].refresh_from_db()
+        self.assertEqual(self.parents[5].subchildren_count, 0)
+        self.assertEqual(self.parents[7].subchildren_count, 4)
+
+    def test_cascade_pk_chunks(self):
+        # pk sets of the cascade are filtered in chunks of querysize
+        Child.objects.all().update(parent=self.parents[0])
+        with mock.patch.object(active_resolver, '_update_records', wraps=active_resolver._update_records) as m:
+            active_resolver._update_cascade({Parent: [set(p.pk for p in self.parents), None]})
+        sizes = [c[0][0].count() for c in m.call_args_list if c[0][0].model == Parent]
+        self.assertEqual(sizes, [3, 3, 3, 1])
+        for p in Parent.objects.all():
+            self.assertEqual(p.children_count, 20 if p.pk == self.parents[0].pk else 0)
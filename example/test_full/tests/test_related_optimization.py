@@ -1,10 +1,12 @@
+from unittest import mock
 from django.test import TestCase
 from ..models import ParentNotO, ChildNotO, SubChildNotO, ParentO, ChildO, SubChildO
 from ..models import (ParentReverseNotO, ChildReverseNotO, SubChildReverseNotO,
                       ParentReverseO, ChildReverseO, SubChildReverseO)
 from django.test.utils import CaptureQueriesContext
 from django.db import connection
-from computedfields.models import preupdate_dependent, update_dependent
+from ..models import FixtureParent, FixtureChild, BatchParent, PrecomputedSkip
+from computedfields.models import preupdate_dependent, update_dependent, active_resolver
 
 
 class SelectRelatedOptimization(TestCase):
@@ -146,5 +148,72 @@ class PrefetchRelatedOptimization(TestCase):
         self.assertEqual(self.p2_o.children_comp,
             'c1_0#s1_0,s1_1,s1_2,s1_3,s1_4,s1_5,s1_6,s1_7,s1_8,s1_9')
 
-        # should save 10 individual queries, but adds 2 for to prefetch related subs --> 8
-        self.assertEqual(unoptimized - optimized, 8)
+        # should save 10 individual queries, old and new parent are updated in one pass
+        # (prefetch related subs cost the same in both cases) --> 10
+        self.assertEqual(unoptimized - optimized, 10)
+
+
+class DerivedOptimization(TestCase):
+    def derived(self, model, fieldname):
+        # plans with derived optimizations turned on for an opted out field
+        computed = dict(model._meta.get_field(fieldname)._computed, auto_related=True, auto_prefetch=True)
+        active_resolver._plan.cache_clear()
+        self.addCleanup(active_resolver._plan.cache_clear)
+        return mock.patch.dict(model._meta.get_field(fieldname).__dict__, {'_computed': computed})
+
+    def test_map(self):
+        self.assertEqual(active_resolver._related[SubChildNotO]['parents'],
+                         [['parent', 'parent__parent'], []])
+        self.assertEqual(active_resolver._related[ParentReverseNotO]['children_comp'],
+                         [[], ['children', 'children__subchildren']])
+        # self dependencies only
+        self.assertNotIn(PrecomputedSkip, active_resolver._related)
+
+    def test_plans(self):
+        plan = active_resolver.get_plan(FixtureChild)
+        self.assertEqual(plan.select_related, frozenset(['parent']))
+        self.assertEqual(plan.prefetch_related, ())
+        # prefetch is opt-in
+        plan = active_resolver.get_plan(FixtureParent)
+        self.assertEqual(plan.select_related, frozenset())
+        self.assertEqual(plan.prefetch_related, ())
+        with self.derived(FixtureParent, 'children_count'):
+            self.assertEqual(active_resolver.get_plan(FixtureParent).prefetch_related, ('children',))
+        # explicit optimizations replace derived ones
+        self.assertEqual(active_resolver.get_plan(ParentReverseO).prefetch_related, ('children__subchildren',))
+        # opt-out and batch fields
+        self.assertEqual(active_resolver.get_plan(ParentReverseNotO).prefetch_related, ())
+        self.assertEqual(active_resolver.get_plan(BatchParent).prefetch_related, ())
+
+    def test_select_queries(self):
+        parent = ParentNotO.objects.create(name='p')
+        child = ChildNotO.objects.create(name='c', parent=parent)
+        for i in range(10):
+            SubChildNotO.objects.create(name='s{}'.format(i), parent=child)
+        with CaptureQueriesContext(connection) as unoptimized:
+            parent.name = 'P1'
+            parent.save(update_fields=['name'])
+        with self.derived(SubChildNotO, 'parents'):
+            self.assertEqual(active_resolver.get_plan(SubChildNotO).select_related,
+                             frozenset(['parent', 'parent__parent']))
+            with CaptureQueriesContext(connection) as derived:
+                parent.name = 'P2'
+                parent.save(update_fields=['name'])
+        self.assertEqual(len(unoptimized) - len(derived), 20)
+        for el in SubChildNotO.objects.all():
+            self.assertEqual(el.parents, '{}$c$P2'.format(el.name))
+
+    def test_prefetch_queries(self):
+        parent = ParentReverseNotO.objects.create(name='p')
+        for i in range(10):
+            child = ChildReverseNotO.objects.create(name='c{}'.format(i), parent=parent)
+            SubChildReverseNotO.objects.create(name='s{}'.format(i), parent=child)
+        with CaptureQueriesContext(connection) as unoptimized:
+            update_dependent(ChildReverseNotO.objects.all())
+        with self.derived(ParentReverseNotO, 'children_comp'):
+            with CaptureQueriesContext(connection) as derived:
+                update_dependent(ChildReverseNotO.objects.all())
+        # 1 + 10 queries for the children and their subchildren turn into 2 prefetches
+        self.assertEqual(len(unoptimized) - len(derived), 9)
+        parent.refresh_from_db()
+        self.assertEqual(parent.children_comp, '$'.join('c{0}#s{0}'.format(i) for i in range(10)))
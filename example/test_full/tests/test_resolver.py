@@ -6,10 +6,14 @@ Tests here are for rare branches and exception traps, that should not
 happen during normal operation mode.
 """
 import os
-from django.test import TestCase
+import stat
+import marshal
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.db.models.signals import class_prepared
 from django.conf import settings
-from computedfields.resolver import Resolver, active_resolver, ResolverException
+from computedfields.resolver import Resolver, active_resolver, ResolverException, MAP_VERSION
 from .. import models
 
 
@@ -114,29 +118,98 @@ class TestResolverInstance(TestCase):
         with self.assertRaises(ResolverException):
             self.resolver.initialize()
 
-    def test_pickled_load(self):
-        # write pickled map file
+    def test_compiled_load(self):
+        # write compiled map file
         class_prepared.connect(self.resolver.add_model)
         rt_field, rt_model = generate_computedmodel(self.resolver, 'RuntimeGeneratedG', lambda self: self.name.upper())
         class_prepared.disconnect(self.resolver.add_model)
         self.resolver.initialize()
 
-        # patch test_full.models (otherwise pickle doesnt work)
-        models.RuntimeGeneratedG = rt_model
-
         settings.COMPUTEDFIELDS_MAP = 'mapfile.test_generated'
-        self.resolver._write_pickled_data()
+        self.resolver._write_map()
 
-        # load back pickled file
-        data = self.resolver._load_pickled_data()
+        # load back compiled file, models get resolved by label
+        data = self.resolver._load_map()
+        with open('mapfile.test_generated', 'rb') as f:
+            raw = marshal.load(f)
+        # readable according to the umask, not only by the owner
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = stat.S_IMODE(os.stat('mapfile.test_generated').st_mode)
         settings.COMPUTEDFIELDS_MAP = None
         os.remove('mapfile.test_generated')
-        
-        # compare pickle data
+
+        # compare map data
+        self.assertEqual(raw['version'], MAP_VERSION)
+        self.assertEqual(mode, 0o666 & ~umask)
+        self.assertEqual(raw['local_mro'], {'test_full.RuntimeGeneratedG': {'base': ['comp'], 'fields': {'comp': 1, 'name': 1}}})
         self.assertEqual(data['hash'], self.resolver._calc_modelhash())
         self.assertEqual(data['lookup_map'], self.resolver._map)
         self.assertEqual(data['fk_map'], self.resolver._fk_map)
         self.assertEqual(data['local_mro'], self.resolver._local_mro)
+        self.assertEqual(data['m2m'], self.resolver._m2m)
+        self.assertEqual(data['related'], self.resolver._related)
+        self.assertEqual(data['model_rank'], self.resolver._model_rank)
+
+    def test_compiled_load_outdated(self):
+        class_prepared.connect(self.resolver.add_model)
+        rt_field, rt_model = generate_computedmodel(self.resolver, 'RuntimeGeneratedGG', lambda self: self.name.upper())
+        class_prepared.disconnect(self.resolver.add_model)
+        self.resolver.initialize()
+
+        settings.COMPUTEDFIELDS_MAP = 'mapfile.test_generated'
+        try:
+            # missing file
+            self.assertEqual(self.resolver._load_map(), None)
+            # other format version
+            with open('mapfile.test_generated', 'wb') as f:
+                marshal.dump({'version': MAP_VERSION - 1, 'hash': self.resolver._calc_modelhash()}, f)
+            self.assertEqual(self.resolver._load_map(), None)
+            # garbage
+            with open('mapfile.test_generated', 'wb') as f:
+                f.write(b'\x00garbage')
+            self.assertEqual(self.resolver._load_map(), None)
+        finally:
+            settings.COMPUTEDFIELDS_MAP = None
+            if os.path.exists('mapfile.test_generated'):
+                os.remove('mapfile.test_generated')
+
+    def test_map_dir_regeneration(self):
+        class_prepared.connect(self.resolver.add_model)
+        rt_field, rt_model = generate_computedmodel(self.resolver, 'RuntimeGeneratedGH', lambda self: self.name.upper())
+        class_prepared.disconnect(self.resolver.add_model)
+        with tempfile.TemporaryDirectory() as mapdir, override_settings(COMPUTEDFIELDS_MAP_DIR=mapdir):
+            # missing map file gets created under the models hash
+            self.resolver.initialize()
+            path = os.path.join(mapdir, self.resolver._calc_modelhash() + '.map')
+            self.assertTrue(os.path.exists(path))
+            self.assertNotEqual(self.resolver._graph, None)
+
+            # next load uses the map file without graph reduction
+            self.resolver._map_loaded = False
+            with mock.patch.object(self.resolver, '_graph_reduction') as reduction:
+                self.resolver.load_maps()
+            reduction.assert_not_called()
+            self.assertEqual(self.resolver._graph, None)
+            self.assertEqual(self.resolver._local_mro, {rt_model: {'base': ['comp'], 'fields': {'comp': 1, 'name': 1}}})
+
+            # a process waiting on the lock loads the map file of the first process
+            with mock.patch.object(self.resolver, '_graph_reduction') as reduction:
+                graph, maps = self.resolver._regenerate_map(path)
+            reduction.assert_not_called()
+            self.assertEqual(graph, None)
+            self.assertEqual(maps['local_mro'], self.resolver._local_mro)
+
+    def test_regeneration_not_writable(self):
+        class_prepared.connect(self.resolver.add_model)
+        rt_field, rt_model = generate_computedmodel(self.resolver, 'RuntimeGeneratedGI', lambda self: self.name.upper())
+        class_prepared.disconnect(self.resolver.add_model)
+        with tempfile.NamedTemporaryFile() as blocker, \
+                override_settings(COMPUTEDFIELDS_MAP=os.path.join(blocker.name, 'map')):
+            # falls back to a full bootstrap
+            self.resolver.initialize()
+        self.assertNotEqual(self.resolver._graph, None)
+        self.assertEqual(self.resolver._map_loaded, True)
 
     def test_runtime_coverage(self):
         class_prepared.connect(self.resolver.add_model)
@@ -156,3 +229,61 @@ class TestResolverInstance(TestCase):
         self.assertEqual(self.resolver.is_computedfield(rt_model, 'name'), False)
         self.assertEqual(self.resolver.is_computedfield(rt_model, 'comp'), True)
         self.assertEqual(self.resolver.is_computedfield(models.Concrete, 'name'), False)
+
+
+class TestUpdatePlans(TestCase):
+    def test_precompiled(self):
+        plan = active_resolver.get_plan(models.Parent)
+        self.assertEqual(list(plan.mro), active_resolver.get_local_mro(models.Parent))
+        self.assertEqual(set(plan.mro), {'children_count', 'subchildren_count', 'subchildren_count_proxy'})
+        self.assertEqual(plan.runs, ((False, plan.mro),))
+        self.assertIs(active_resolver.get_plan(models.Parent), plan)
+
+    def test_update_fields(self):
+        plan = active_resolver.get_plan(models.Child, {'subchildren_count'})
+        self.assertEqual(plan.mro, ('subchildren_count',))
+        self.assertEqual(plan.dependents, ((models.Parent, frozenset(['subchildren_count_proxy']), ('children',)),))
+        self.assertIs(active_resolver.get_plan(models.Child, ['subchildren_count']), plan)
+        self.assertEqual(active_resolver.get_plan(models.Child, set()).mro, ())
+
+    def test_reset_on_load(self):
+        plan = active_resolver.get_plan(models.Parent)
+        active_resolver.load_maps(_force_recreation=True)
+        self.assertIsNot(active_resolver.get_plan(models.Parent), plan)
+        self.assertEqual(active_resolver.get_plan(models.Parent), plan)
+
+
+class TestLocalMroCache(TestCase):
+    def test_cache(self):
+        active_resolver._mro_cache.pop(models.Parent, None)
+        active_resolver.reset_stats()
+        full = active_resolver._local_mro_for(models.Parent)
+        self.assertIs(active_resolver._local_mro_for(models.Parent), full)
+        mro = active_resolver._local_mro_for(models.Parent, ['subchildren_count'])
+        self.assertEqual(mro, ('subchildren_count',))
+        # same bitmask by different fields
+        self.assertIs(active_resolver._local_mro_for(models.Parent, {'subchildren_count', 'xy'}), mro)
+        self.assertEqual(active_resolver.stats['mro_hits'], 1)
+        self.assertEqual(active_resolver.stats['mro_misses'], 1)
+        # public api returns a list
+        self.assertEqual(active_resolver.get_local_mro(models.Parent, ['subchildren_count']), ['subchildren_count'])
+        self.assertEqual(active_resolver.stats['mro_hits'], 2)
+
+
+class TestSignalHandlers(TestCase):
+    def test_senders(self):
+        from django.contrib.contenttypes.models import ContentType
+        from django.db.models.signals import post_save, m2m_changed
+        self.assertFalse(post_save.has_listeners(ContentType))
+        self.assertTrue(post_save.has_listeners(models.Subchild))
+        through = next(iter(active_resolver._m2m))
+        self.assertTrue(m2m_changed.has_listeners(through))
+
+    def test_resync_on_load(self):
+        from django.db.models.signals import post_init
+        self.assertFalse(post_init.has_listeners(models.SelfA))
+        with mock.patch.object(active_resolver, '_track_changes', True):
+            active_resolver.load_maps(_force_recreation=True)
+            self.assertTrue(post_init.has_listeners(models.SelfA))
+        active_resolver.load_maps(_force_recreation=True)
+        self.assertFalse(post_init.has_listeners(models.SelfA))
@@ -0,0 +1,111 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from ..models import TrackA, TrackB
+from computedfields.models import active_resolver, UpdateJob
+from computedfields.handlers import connect_handlers
+
+
+class TestTrackChanges(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(active_resolver, '_track_changes', True)
+        patcher.start()
+        # connects post_init for the tracked models
+        connect_handlers(active_resolver)
+        self.addCleanup(connect_handlers, active_resolver)
+        self.addCleanup(patcher.stop)
+        self.a = TrackA.objects.create(name='a')
+        self.b = TrackB.objects.create(a=self.a)
+
+    def test_unrelated_field(self):
+        a = TrackA.objects.get()
+        a.note = 'note'
+        with mock.patch.object(active_resolver, 'update_dependent',
+                               wraps=active_resolver.update_dependent) as update:
+            a.save()
+        update.assert_not_called()
+        a.refresh_from_db()
+        self.assertEqual(a.note, 'note')
+
+    def test_related_field(self):
+        a = TrackA.objects.get()
+        a.name = 'b'
+        with mock.patch.object(active_resolver, 'update_dependent',
+                               wraps=active_resolver.update_dependent) as update:
+            a.save()
+        update.assert_called_once()
+        self.assertEqual(update.call_args[0][2], {'name', 'upper'})
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.comp, 'B')
+
+    @override_settings(COMPUTEDFIELDS_CONSISTENCY={'test_full.TrackA': 'eventual'})
+    def test_unchanged_old_relations_consistency(self):
+        a = TrackA.objects.get()
+        a.note = 'note'
+        # old relations of an unchanged save follow the consistency level
+        with mock.patch('computedfields.handlers.UPDATE_OLD.pop', return_value={TrackB: [{self.b.pk}, None]}):
+            with mock.patch.object(active_resolver, '_update_cascade') as cascade:
+                a.save()
+        cascade.assert_not_called()
+        self.assertEqual(UpdateJob.objects.count(), 1)
+
+    def test_local_narrowed(self):
+        TrackA.objects.update(upper='drift')
+        a = TrackA.objects.get()
+        a.note = 'note'
+        a.save()
+        a.refresh_from_db()
+        # unchanged input fields do not recalculate local computed fields,
+        # values drifted by bulk actions persist (documented for the setting)
+        self.assertEqual(a.upper, 'drift')
+        a.name = 'c'
+        a.save()
+        a.refresh_from_db()
+        self.assertEqual(a.upper, 'C')
+
+    def test_refresh(self):
+        a = TrackA.objects.get()
+        other = TrackA.objects.get()
+        other.name = 'x'
+        other.save()
+        # the reload moves the snapshot to 'x', thus 'a' is a change again
+        a.refresh_from_db()
+        a.name = 'a'
+        a.save()
+        a.refresh_from_db()
+        self.assertEqual(a.upper, 'A')
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.comp, 'A')
+
+    def test_refresh_fields(self):
+        a = TrackA.objects.get()
+        other = TrackA.objects.get()
+        other.name = 'x'
+        other.save()
+        a.refresh_from_db(fields=['name'])
+        a.name = 'a'
+        a.save()
+        a.refresh_from_db()
+        self.assertEqual(a.upper, 'A')
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.comp, 'A')
+
+    def test_partial_save(self):
+        a = TrackA.objects.get()
+        a.name = 'd'
+        a.note = 'note'
+        a.save(update_fields=['note'])
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.comp, 'A')
+        # name is still pending in the snapshot
+        a.save()
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.comp, 'D')
+
+    def test_untracked_instance(self):
+        a = TrackA.objects.get()
+        del a._computedfields_snapshot
+        a.note = 'note'
+        with mock.patch.object(active_resolver, 'update_dependent',
+                               wraps=active_resolver.update_dependent) as update:
+            a.save()
+        update.assert_called_once()
@@ -16,7 +16,7 @@ setup(
     name='django-computedfields',
     packages=find_packages(exclude=['example']),
     include_package_data=True,
-    install_requires=[],
+    install_requires=['contextvars;python_version<"3.7"'],
     version=get_version('computedfields/__init__.py'),
     license='MIT',
     description='autoupdated database fields for model methods',